@@ -0,0 +1,78 @@
+import io
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import pygame
+
+
+class AudioPlayer:
+    """
+    Plays one clip at a time through pygame.mixer.music.
+
+    The mixer is initialized once and kept for the life of the player. Clips are
+    read into memory and played from there, so no handle stays open on the audio
+    file (it can be moved as soon as it is loaded), and preload() reads upcoming
+    clips on a background thread. pygame itself is only touched from the caller's
+    (UI) thread.
+    """
+
+    def __init__(self):
+        if not pygame.mixer.get_init():
+            pygame.mixer.init()
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="audio-preload")
+        self._buffers = {}      # path -> Future of the file's bytes
+        self._lock = threading.Lock()
+        self._clip = None       # in-memory file the mixer is playing from
+        self.path = None        # path of the loaded clip
+
+    @staticmethod
+    def _read(path):
+        with open(path, "rb") as f:
+            return f.read()
+
+    def preload(self, paths):
+        """Read these clips into memory in the background and drop any other preloaded clip."""
+        wanted = {path for path in paths if path}
+        with self._lock:
+            for path in list(self._buffers):
+                if path not in wanted:
+                    self._buffers.pop(path).cancel()
+            for path in wanted:
+                if path not in self._buffers:
+                    self._buffers[path] = self._executor.submit(self._read, path)
+
+    def _data(self, path):
+        with self._lock:
+            future = self._buffers.get(path)
+        if future is None or future.cancelled():
+            return self._read(path)
+        return future.result()
+
+    def play(self, path):
+        """Play path from the start, loading it first unless it is the loaded clip."""
+        if path != self.path:
+            self.unload()
+            self._clip = io.BytesIO(self._data(path))
+            pygame.mixer.music.load(self._clip, namehint=os.path.splitext(path)[1].lstrip("."))
+            self.path = path
+        pygame.mixer.music.play()
+
+    def stop(self):
+        pygame.mixer.music.stop()
+
+    def unload(self):
+        """Stop and release the loaded clip."""
+        pygame.mixer.music.stop()
+        if self.path is not None:
+            pygame.mixer.music.unload()
+            self._clip = None
+            self.path = None
+
+    def is_playing(self):
+        return pygame.mixer.music.get_busy()
+
+    def position(self):
+        """Seconds played since the last play(), or 0.0 when nothing is playing."""
+        position_ms = pygame.mixer.music.get_pos()
+        return position_ms / 1000 if position_ms > 0 else 0.0
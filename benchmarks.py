@@ -0,0 +1,202 @@
+"""
+Micro-benchmarks for the hot paths of the extractor and the database layer.
+
+Usage:
+    python benchmarks.py            # run every benchmark
+    python benchmarks.py matchers   # run a single one
+"""
+import os
+import re
+import sqlite3
+import sys
+import tempfile
+import time
+import timeit
+import unicodedata
+
+from info_extractor import (
+    TRANSCRIBER_TOKENS, EXAM_TYPES, doctor_map,
+    find_transcriber_any_token, find_exam_type, find_doctor_in_paragraphs,
+    extract_header_fields
+)
+from medical_db import MedicalReportDB
+
+
+# ------------------ LEGACY IMPLEMENTATIONS (baselines) ------------------ #
+def remove_accents(s: str) -> str:
+    return ''.join(
+        c for c in unicodedata.normalize('NFKD', s)
+        if unicodedata.category(c) != 'Mn'
+    )
+
+def legacy_find_transcriber_any_token(transcripcion: str) -> str:
+    trans_norm = remove_accents(transcripcion).upper()
+    for token, full_name in TRANSCRIBER_TOKENS.items():
+        token_norm = remove_accents(token).upper()
+        if token_norm in trans_norm:
+            return full_name
+    return ""
+
+def legacy_find_exam_type(procedimiento: str) -> str:
+    proc_norm = remove_accents(procedimiento).upper()
+    for exam_key, keywords in EXAM_TYPES.items():
+        for kw in keywords:
+            kw_norm = remove_accents(kw).upper()
+            if kw_norm in proc_norm:
+                return exam_key
+    return ""
+
+def legacy_identify_doctor(paragraph_text: str) -> str:
+    normalized = remove_accents(paragraph_text).lower()
+    for doctor_name, keywords in doctor_map.items():
+        for kw in keywords:
+            kw_norm = remove_accents(kw).lower()
+            if kw_norm in normalized:
+                return doctor_name
+    return ""
+
+def legacy_find_doctor_in_paragraphs(paragraphs: list) -> str:
+    for p in reversed(paragraphs):
+        doctor_found = legacy_identify_doctor(p)
+        if doctor_found:
+            return doctor_found
+    return ""
+
+def legacy_extract_header_fields(header_text: str) -> dict:
+    fields = {}
+    norm_header = remove_accents(header_text).lower()
+
+    patterns = {
+        "paciente": r"paciente\s*:\s*(.*?)(?=\s+\w+\s*:|$)",
+        "documento": r"documento\s*:\s*(.*?)(?=\s+\w+\s*:|$)",
+        "entidad": r"entidad\s*:\s*(.*?)(?=\s+\w+\s*:|$)",
+        "procedimiento": r"procedimiento\s*:\s*(.*?)(?=\s+\w+\s*:|$)",
+        "fecha": r"fecha\s*:\s*(\d{2}/\d{2}/\d{4})",
+        "nro_remision": r"nro\s+remisi(?:o|ó)n\s*:\s*(.*?)(?=\s+\w+\s*:|$)",
+        "transcripcion": r"transcripci(?:o|ó)n\s*:\s*(.*?)(?=\s+\w+\s*:|$)"
+    }
+
+    for field, pattern in patterns.items():
+        match = re.search(pattern, norm_header, flags=re.IGNORECASE | re.DOTALL)
+        if match:
+            fields[field] = " ".join(match.group(1).split())
+    return fields
+
+def legacy_insert_record(conn, record):
+    """The old per-record path: sequence lookup, one INSERT, one commit (rollback journal)."""
+    cursor = conn.cursor()
+    cursor.execute("SELECT seq FROM sqlite_sequence WHERE name='medical_reports';")
+    row = cursor.fetchone()
+    new_id = row[0] + 1 if row else 1
+    cursor.execute('''
+        INSERT INTO medical_reports (
+            patient_id, patient_name, medical_procedure, procedure_date,
+            transcriptor, transcription_date, doctor, audio_file_path, pdf_file_path,
+            ambulatorio, multiple_audios
+        ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+    ''', (record["patient_id"], record["patient_name"], record["medical_procedure"],
+          record["procedure_date"], record["transcriptor"], record["transcription_date"],
+          record["doctor"], f"{new_id}.mp3", f"{new_id}.pdf",
+          record["ambulatorio"], record["multiple_audios"]))
+    conn.commit()
+
+
+# ------------------ HELPERS ------------------ #
+def _report(label, legacy_seconds, new_seconds, number):
+    print(f"{label:<28} legacy {legacy_seconds / number * 1e6:9.1f} us   "
+          f"new {new_seconds / number * 1e6:9.1f} us   x{legacy_seconds / new_seconds:5.1f}")
+
+
+# ------------------ BENCHMARKS ------------------ #
+def bench_matchers(number=2000):
+    """Compiled KeywordMatcher vs the nested keyword loops it replaced."""
+    transcripcion = "Gloria Neiver Ospina - 16/10/2024 12:18:54 -"
+    procedimiento = ("ECOGRAFIA DE ABDOMEN TOTAL (HIGADO PANCREAS VESICULA VIAS BILIARES "
+                     "RIÑONES BAZO GRANDES VASOS PELVIS Y FLANCOS)")
+    # A typical two-page report: the signature sits at the very bottom
+    paragraphs = [f"Linea {i} del informe sin firma, hígado de tamaño normal." for i in range(120)]
+    paragraphs += ["Atentamente,", "Dra. Lynda Ivette Carvajal Acosta", "Médica Radióloga"]
+
+    cases = [
+        ("transcriber", legacy_find_transcriber_any_token, find_transcriber_any_token, transcripcion),
+        ("exam type", legacy_find_exam_type, find_exam_type, procedimiento),
+        ("doctor (123 paragraphs)", legacy_find_doctor_in_paragraphs, find_doctor_in_paragraphs, paragraphs),
+    ]
+    for label, legacy, new, arg in cases:
+        assert legacy(arg) == new(arg), label
+        legacy_seconds = timeit.timeit(lambda: legacy(arg), number=number)
+        new_seconds = timeit.timeit(lambda: new(arg), number=number)
+        _report(label, legacy_seconds, new_seconds, number)
+
+def bench_header_fields(sizes=(1000, 4000, 16000, 64000)):
+    """
+    Header tokenizer vs the seven lazy DOTALL regexes on synthetic headers whose
+    procedimiento runs long with no colons. Time per character staying flat as the
+    header grows shows linear scaling.
+    """
+    labels = ("Paciente : ROMERO GARCIA JOSE Documento : CC - 1006964711 - Sexo : M "
+              "Entidad : CLINICA DEL COUNTRY Procedimiento : ")
+    trailer = " Fecha : 08/07/2024 Nro remisión : 889418 Transcripción : Gloria Neiver Ospina 10/07/2024"
+    filler = "ECOGRAFIA DE ABDOMEN TOTAL HIGADO PANCREAS VESICULA VIAS BILIARES RINONES "
+    for size in sizes:
+        header = labels + (filler * (size // len(filler) + 1))[:size] + trailer
+        number = max(1, 200000 // size)
+        start = time.perf_counter()
+        for _ in range(number):
+            extract_header_fields(header)
+        new_seconds = time.perf_counter() - start
+        start = time.perf_counter()
+        for _ in range(number):
+            legacy_extract_header_fields(header)
+        legacy_seconds = time.perf_counter() - start
+        _report(f"header {len(header)} chars", legacy_seconds, new_seconds, number)
+        print(f"{'':<28} new {new_seconds / number / len(header) * 1e9:6.1f} ns/char   "
+              f"legacy {legacy_seconds / number / len(header) * 1e9:6.1f} ns/char")
+
+def bench_insert(rows=2000):
+    """
+    Rows/second of the old commit-per-record insert vs plan_record() plus insert_records()
+    in one transaction. Both paths look up their IDs inside the timed loop: the old one
+    reads sqlite_sequence per row, plan_record() draws them from blocks of ID_BLOCK_SIZE.
+    Both databases get the current schema, so every row also goes through the full-text
+    index and stored_files refcount triggers: those, not the commits, bound the new path.
+    """
+    reports = [dict(
+        patient_id=str(1000000 + i), patient_name=f"paciente numero {i}",
+        medical_procedure="ECO ABDOMEN", procedure_date="08/07/2024",
+        transcriptor="Gloria Neiver Ospina", transcription_date="10/07/2024",
+        doctor="Dra. Lynda Carvajal", audio_src_path=f"{i + 1}.mp3", pdf_src_path=f"{i + 1}.pdf",
+        report_text="HALLAZGOS\nHigado de tamano normal.",
+    ) for i in range(rows)]
+    records = [dict(report, ambulatorio=0, multiple_audios=0) for report in reports]
+    with tempfile.TemporaryDirectory() as folder:
+        legacy_path = os.path.join(folder, "legacy.db")
+        MedicalReportDB(legacy_path).close()   # same schema, then back to the default journal
+        conn = sqlite3.connect(legacy_path)
+        conn.execute("PRAGMA journal_mode=DELETE;")
+        start = time.perf_counter()
+        for record in records:
+            legacy_insert_record(conn, record)
+        legacy_seconds = time.perf_counter() - start
+        conn.close()
+
+        db = MedicalReportDB(os.path.join(folder, "bulk.db"))
+        start = time.perf_counter()
+        db.insert_records([db.plan_record(**report) for report in reports])
+        new_seconds = time.perf_counter() - start
+        db.close()
+    _report(f"insert {rows} rows", legacy_seconds, new_seconds, rows)
+    print(f"{'':<28} legacy {rows / legacy_seconds:9.0f} rows/s   new {rows / new_seconds:9.0f} rows/s")
+
+
+BENCHMARKS = {
+    "matchers": bench_matchers,
+    "header": bench_header_fields,
+    "insert": bench_insert,
+}
+
+if __name__ == "__main__":
+    selected = sys.argv[1:] or list(BENCHMARKS)
+    for name in selected:
+        print(f"--- {name} ---")
+        BENCHMARKS[name]()
@@ -21,10 +21,37 @@ DESKTOP_DIR = os.path.normpath(config["DESKTOP_DIR"])
 RECEIVER_DIR = os.path.normpath(config["RECEIVER_DIR"])
 DATABASE_DIR = os.path.normpath(config["DATABASE_DIR"])
 AMBULATORIOS_DIR = os.path.normpath(config["AMBULATORIOS_DIR"])
+# Optional: where parsed PDF results are cached (defaults next to the database)
+EXTRACTION_CACHE_PATH = os.path.normpath(config.get(
+    "EXTRACTION_CACHE_PATH",
+    os.path.join(os.path.dirname(DATABASE_DIR), "extraction_cache.db")
+))
+
+# Optional: PDF text backend, "pypdf2", or opt in to the fast decoder with "auto"
+# (PyPDF2 fallback when a required field is missing) or "raw"
+PDF_BACKEND = config.get("PDF_BACKEND", "pypdf2")
+
+# Optional: number of processes used to parse PDFs in a batch (None = one per CPU)
+EXTRACTION_WORKERS = config.get("EXTRACTION_WORKERS")
+
+# Optional: how stored files are spread in db_files, "flat" (one folder), "hash" (ab/cd/),
+# "date" (YYYY/MM/) or "content" (each distinct file stored once under its SHA-256).
+# Files already stored are only moved to the layout when one is set here (at app start)
+# or by running file_handler.py --migrate-storage
+STORAGE_LAYOUT = config.get("STORAGE_LAYOUT", "flat")
+STORAGE_LAYOUT_CONFIGURED = "STORAGE_LAYOUT" in config
+
+# Optional: pack stored files into monthly archive bundles once their procedure month
+# is older than this many months (None = never archive)
+ARCHIVE_AFTER_MONTHS = config.get("ARCHIVE_AFTER_MONTHS")
+
+# Optional: pairs parsed ahead of the one on screen when verifying a folder of pairs
+VERIFY_PREFETCH_LOOKAHEAD = config.get("VERIFY_PREFETCH_LOOKAHEAD", 3)
 
 # Print for verification
 print(f"DESKTOP_DIR: {DESKTOP_DIR}")
 print(f"RECEIVER_DIR: {RECEIVER_DIR}")
 print(f"DATABASE_DIR: {DATABASE_DIR}")
 print(f"AMBULATORIOS_DIR: {AMBULATORIOS_DIR}")
+print(f"EXTRACTION_CACHE_PATH: {EXTRACTION_CACHE_PATH}")
 
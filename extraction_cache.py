@@ -0,0 +1,148 @@
+import hashlib
+import json
+import os
+import sqlite3
+import time
+
+# Read files in 1 MiB chunks so large documents are never fully loaded in memory
+HASH_CHUNK_SIZE = 1024 * 1024
+
+# A hit rewrites last_used only when the stored value is older than this, so reading
+# a warm cache does not turn every lookup into a write transaction
+LAST_USED_REFRESH_SECONDS = 24 * 60 * 60
+
+
+def file_sha256(file_path: str, chunk_size: int = HASH_CHUNK_SIZE) -> str:
+    """
+    Return the hex SHA-256 of the file contents, streaming it in chunks.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+class ExtractionCache:
+    """
+    Persistent cache of extraction results keyed by (content hash, extractor version).
+
+    Because the key is the file content and not its path, a cached entry survives
+    renames and copies (e.g. into RECEIVER_DIR). Entries are evicted least recently
+    used first once the cache holds more than max_entries rows; recency is tracked
+    to within LAST_USED_REFRESH_SECONDS.
+    """
+
+    def __init__(self, db_path, max_entries=50000):
+        self.db_path = db_path
+        self.max_entries = max_entries
+        # The file and table are created on first use, so enabling the cache is free
+        self._ready = False
+
+    def _create_table(self):
+        folder = os.path.dirname(os.path.abspath(self.db_path))
+        os.makedirs(folder, exist_ok=True)
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        try:
+            # Stored in the file: lookups from the batch workers read while a put() writes
+            conn.execute("PRAGMA journal_mode=WAL;")
+            conn.execute('''
+                CREATE TABLE IF NOT EXISTS extraction_cache (
+                    content_hash TEXT NOT NULL,
+                    extractor_version TEXT NOT NULL,
+                    result_json TEXT NOT NULL,
+                    last_used REAL NOT NULL,
+                    PRIMARY KEY (content_hash, extractor_version)
+                );
+            ''')
+            conn.execute("CREATE INDEX IF NOT EXISTS idx_cache_last_used ON extraction_cache(last_used);")
+            conn.commit()
+        finally:
+            conn.close()
+        self._ready = True
+
+    def _connect(self):
+        # A short-lived connection per operation keeps the cache safe to use from
+        # several threads and worker processes at once.
+        if not self._ready:
+            self._create_table()
+        conn = sqlite3.connect(self.db_path, timeout=30)
+        conn.execute("PRAGMA synchronous=NORMAL;")
+        return conn
+
+    def get(self, content_hash, extractor_version):
+        """Return the cached result dict, or None on a miss."""
+        conn = self._connect()
+        try:
+            row = conn.execute(
+                "SELECT result_json, last_used FROM extraction_cache WHERE content_hash = ? AND extractor_version = ?;",
+                (content_hash, extractor_version)
+            ).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            if now - row[1] > LAST_USED_REFRESH_SECONDS:
+                conn.execute(
+                    "UPDATE extraction_cache SET last_used = ? WHERE content_hash = ? AND extractor_version = ?;",
+                    (now, content_hash, extractor_version)
+                )
+                conn.commit()
+            return json.loads(row[0])
+        finally:
+            conn.close()
+
+    def put(self, content_hash, extractor_version, result):
+        """Store a result dict and evict the oldest entries above max_entries."""
+        conn = self._connect()
+        try:
+            conn.execute(
+                "INSERT OR REPLACE INTO extraction_cache (content_hash, extractor_version, result_json, last_used) "
+                "VALUES (?, ?, ?, ?);",
+                (content_hash, extractor_version, json.dumps(result), time.time())
+            )
+            count = conn.execute("SELECT count(*) FROM extraction_cache;").fetchone()[0]
+            excess = count - self.max_entries
+            if excess > 0:
+                conn.execute('''
+                    DELETE FROM extraction_cache WHERE rowid IN (
+                        SELECT rowid FROM extraction_cache ORDER BY last_used LIMIT ?
+                    );
+                ''', (excess,))
+            conn.commit()
+        finally:
+            conn.close()
+
+    def clear(self):
+        """Remove every cached entry."""
+        conn = self._connect()
+        try:
+            conn.execute("DELETE FROM extraction_cache;")
+            conn.commit()
+        finally:
+            conn.close()
+
+
+# ------------------ UNIT TESTS ------------------ #
+import tempfile
+import unittest
+
+class TestExtractionCache(unittest.TestCase):
+    def test_hits_refresh_last_used_only_when_stale(self):
+        with tempfile.TemporaryDirectory() as folder:
+            cache = ExtractionCache(os.path.join(folder, "cache.db"))
+            cache.put("abc", "1", {"nombre": "ANA"})
+            conn = sqlite3.connect(cache.db_path)
+            try:
+                self.assertEqual(conn.execute("PRAGMA journal_mode;").fetchone()[0], "wal")
+                stale = time.time() - 2 * LAST_USED_REFRESH_SECONDS
+                conn.execute("UPDATE extraction_cache SET last_used = ?;", (stale,))
+                conn.commit()
+                self.assertEqual(cache.get("abc", "1"), {"nombre": "ANA"})
+                refreshed = conn.execute("SELECT last_used FROM extraction_cache;").fetchone()[0]
+                self.assertGreater(refreshed, stale)
+                # A recent entry is read without being written back
+                self.assertEqual(cache.get("abc", "1"), {"nombre": "ANA"})
+                self.assertEqual(conn.execute("SELECT last_used FROM extraction_cache;").fetchone()[0], refreshed)
+                self.assertIsNone(cache.get("abc", "2"))
+            finally:
+                conn.close()
@@ -0,0 +1,97 @@
+import os
+import struct
+import zipfile
+import zlib
+
+# ZIP local file header: signature, versions/flags/method/time/date, CRC-32,
+# sizes, then the lengths of the file name and extra field that precede the data
+LOCAL_HEADER = struct.Struct("<4s5H3L2H")
+LOCAL_HEADER_SIGNATURE = b"PK\x03\x04"
+COPY_CHUNK_SIZE = 1024 * 1024
+
+
+class ArchiveError(Exception):
+    """A bundle member is missing, truncated or does not match its CRC-32."""
+
+
+def write_bundle(bundle_path, members):
+    """
+    Write [(arcname, src_path)] into an uncompressed ZIP at bundle_path, synced to disk.
+    Returns [(arcname, data_offset, size, crc32)]: where each member's bytes start,
+    so they can later be read with a single seek instead of parsing the ZIP.
+    """
+    with open(bundle_path, "wb") as raw:
+        with zipfile.ZipFile(raw, "w", compression=zipfile.ZIP_STORED) as bundle:
+            for arcname, src_path in members:
+                bundle.write(src_path, arcname)
+            infos = bundle.infolist()
+        raw.flush()
+        os.fsync(raw.fileno())
+
+    index = []
+    with open(bundle_path, "rb") as f:
+        for info in infos:
+            f.seek(info.header_offset)
+            header = LOCAL_HEADER.unpack(f.read(LOCAL_HEADER.size))
+            if header[0] != LOCAL_HEADER_SIGNATURE:
+                raise ArchiveError(f"Bad local header for {info.filename} in {bundle_path}")
+            name_length, extra_length = header[-2:]
+            data_offset = info.header_offset + LOCAL_HEADER.size + name_length + extra_length
+            index.append((info.filename, data_offset, info.file_size, info.CRC))
+    return index
+
+
+def copy_member(bundle_path, data_offset, size, crc32, dest_path=None):
+    """
+    Copy one member's bytes to dest_path (or only read them, to verify) by seeking
+    to data_offset, checking the CRC-32 as it goes. Raises ArchiveError on mismatch.
+    """
+    checksum = 0
+    remaining = size
+    dest = open(dest_path, "wb") if dest_path else None
+    try:
+        with open(bundle_path, "rb") as src:
+            src.seek(data_offset)
+            while remaining:
+                chunk = src.read(min(COPY_CHUNK_SIZE, remaining))
+                if not chunk:
+                    raise ArchiveError(f"{bundle_path} is truncated at offset {data_offset + size - remaining}")
+                checksum = zlib.crc32(chunk, checksum)
+                if dest:
+                    dest.write(chunk)
+                remaining -= len(chunk)
+        if checksum != crc32:
+            raise ArchiveError(f"CRC mismatch for the member at offset {data_offset} of {bundle_path}")
+    except Exception:
+        if dest:
+            dest.close()
+            os.remove(dest_path)
+        raise
+    if dest:
+        dest.close()
+    return dest_path
+
+
+# ------------------ UNIT TESTS ------------------ #
+import tempfile
+import unittest
+
+class TestFileArchive(unittest.TestCase):
+    def test_members_read_back_by_offset(self):
+        with tempfile.TemporaryDirectory() as folder:
+            members = []
+            for name, data in (("a.mp3", b"audio" * 1000), ("b/c.pdf", b"%PDF")):
+                path = os.path.join(folder, name.replace("/", "_"))
+                with open(path, "wb") as f:
+                    f.write(data)
+                members.append((name, path))
+            bundle_path = os.path.join(folder, "bundle.zip")
+            index = write_bundle(bundle_path, members)
+            # Still an ordinary ZIP
+            self.assertEqual(zipfile.ZipFile(bundle_path).namelist(), ["a.mp3", "b/c.pdf"])
+            _, offset, size, crc = index[1]
+            copy_member(bundle_path, offset, size, crc, os.path.join(folder, "out.pdf"))
+            with open(os.path.join(folder, "out.pdf"), "rb") as f:
+                self.assertEqual(f.read(), b"%PDF")
+            with self.assertRaises(ArchiveError):
+                copy_member(bundle_path, offset, size, crc ^ 1)
@@ -1,19 +1,35 @@
 import os
 from pathlib import Path
+import queue
 import shutil
+import sys
+import threading
+import time
 from datetime import datetime
 from config import *
 
 from medical_db import MedicalReportDB  # Use the provided DB interface
 # Import your extraction function (now supports PDFs directly)
-from info_extractor import get_requested_info
+from info_extractor import (
+    get_requested_info, get_requested_info_many, enable_extraction_cache, set_pdf_backend, template_stats
+)
+from receiver_watcher import ReceiverWatcher
+from ingest_journal import IngestJournal, MOVED
 
 # Folder with incoming files
 receiver_folder = RECEIVER_DIR
 db_path = DATABASE_DIR
 folder_ambulatorios = AMBULATORIOS_DIR
 
-db = MedicalReportDB(db_path=db_path)
+# The reports database and the journal are opened on first use (get_db()), so
+# importing this module, e.g. while the app starts, does not touch the database
+_db = None
+_journal = None
+_db_lock = threading.Lock()
+
+# Each PDF is parsed when verified, copied and batch-saved: cache by content
+enable_extraction_cache(EXTRACTION_CACHE_PATH)
+set_pdf_backend(PDF_BACKEND)
 
 # Allowed file extensions for the two types of files
 AUDIO_EXTENSIONS = {".mp3", ".wav", ".m4a", ".ogg", ".flac"}
@@ -30,25 +46,51 @@ REQUIRED_FIELDS = [
     "Patient ID"
 ]
 
-def process_two_files(doc_path: str, audio_path: str) -> None:
-    """
-    Process a pair of files (one audio, one document):
-      1. Extract the required info using get_requested_info directly on the document.
-      2. Validate that all REQUIRED_FIELDS are present.
-      NO 3. Move the processed document to the designated PDF folder.
-      4. Insert the record into the database. ()a3 is done here)
-    """
-    # --- Change 1: Remove conversion logic ---
-    # Previously, we checked the file extension and converted PDFs to DOCX.
-    # Now, we directly use the file (whether PDF or DOCX) because the extractor handles PDFs.
-    info_dict = get_requested_info(doc_path)
+# Ingest pipeline tuning: queue bound between stages and rows per DB transaction
+PIPELINE_QUEUE_SIZE = 64
+WRITE_BATCH_SIZE = 50
+
+# Watch mode: seconds a file's size must stay unchanged before it is processed,
+# and how often pending files are re-checked
+WATCH_STABLE_SECONDS = 2.0
+WATCH_POLL_INTERVAL = 1.0
+
+def get_db() -> MedicalReportDB:
+    """The reports database, opened the first time it is needed."""
+    global _db, _journal
+    with _db_lock:
+        if _db is None:
+            _db = MedicalReportDB(db_path=db_path, storage_layout=STORAGE_LAYOUT)
+            # Per-group checkpoints of batch runs, so an interrupted batch can resume
+            _journal = IngestJournal(db_path)
+        return _db
+
+def get_journal() -> IngestJournal:
+    get_db()
+    return _journal
+
+def release_db() -> None:
+    """Close the calling thread's database connection, before a worker thread ends."""
+    if _db is not None:
+        _db.release()
+
+def releasing_db(target):
+    """Wrap a thread target so the connection the thread opens is closed when it returns."""
+    def run(*args, **kwargs):
+        try:
+            return target(*args, **kwargs)
+        finally:
+            release_db()
+    return run
+
+def validate_info(info_dict: dict) -> None:
     for field in REQUIRED_FIELDS:
         if not info_dict.get(field, "").strip():
             raise ValueError(f"Missing required field: {field}")
 
-    # --- Change 3: Update database insertion ---
-    # We now use final_pdf_path as the pdf_src_path, since the file has been moved.
-    db.insert_record(
+def record_kwargs(info_dict: dict, doc_path: str, audio_path: str) -> dict:
+    """Map extracted info to MedicalReportDB.insert_record()/prepare_record() arguments."""
+    return dict(
         patient_id=info_dict["Patient ID"],
         patient_name=info_dict["Patient Name"],
         medical_procedure=info_dict["Exam Type"],
@@ -57,11 +99,268 @@ def process_two_files(doc_path: str, audio_path: str) -> None:
         transcription_date=info_dict["Transcription Date"],
         doctor=info_dict["Doctor"],
         audio_src_path=audio_path,
-        pdf_src_path=doc_path
+        pdf_src_path=doc_path,
+        report_text=info_dict.get("Report Text", "")
     )
 
+def process_two_files(doc_path: str, audio_path: str, info_dict: dict = None) -> None:
+    """
+    Process a pair of files (one audio, one document), with the same journal
+    checkpoints as run_pipeline():
+      1. Extract the required info using get_requested_info directly on the document
+         (skipped when info_dict was already extracted by the caller, or by an
+         earlier run that stopped before storing the pair).
+      2. Validate that all REQUIRED_FIELDS are present.
+      3. Move both files into db_files (move_group()).
+      4. Insert the record into the database. Raises if any step fails, with the
+         files back in their source folder.
+    """
+    base = Path(doc_path).stem
+    db, journal = get_db(), get_journal()
+    resumed = journal.discover({doc_path: (base, audio_path)})
+    # --- Change 1: Remove conversion logic ---
+    # Previously, we checked the file extension and converted PDFs to DOCX.
+    # Now, we directly use the file (whether PDF or DOCX) because the extractor handles PDFs.
+    if info_dict is None:
+        info_dict = resumed.get(doc_path) or get_requested_info(doc_path, include_body=True)
+    validate_info(info_dict)
+    journal.mark_extracted(base, info_dict)
+
+    record = move_group(base, doc_path, audio_path, info_dict)
+    try:
+        db.write_record(record, commit=False)
+        journal.mark_inserted(base, db.conn)
+        db.commit()
+    except Exception:
+        db.rollback()
+        db.unstore_record(record)
+        journal.reset_move(base)
+        raise
+    print(f"Record inserted successfully for patient: {record['patient_name']}.")
+
+def move_group(base: str, doc_path: str, audio_path: str, info_dict: dict) -> dict:
+    """
+    Reserve the group's record, journal it, then move both files into db_files.
+    Returns the record, ready to insert; if the move fails the files stay where
+    they were and the group is back to extracted.
+    """
+    db, journal = get_db(), get_journal()
+    record = db.plan_record(**record_kwargs(info_dict, doc_path, audio_path))
+    journal.mark_planned(base, record)
+    try:
+        db.store_record(record)
+    except Exception:
+        journal.reset_move(base)
+        raise
+    journal.mark_moved(base)
+    return record
+
+def start_storage_migration(migrate_layout: bool = True) -> threading.Thread:
+    """
+    Move files stored under an older STORAGE_LAYOUT (unless migrate_layout is False),
+    then archive cold months if ARCHIVE_AFTER_MONTHS is set, in a background thread.
+    """
+    def migrate():
+        try:
+            db = get_db()
+            moved = db.migrate_storage() if migrate_layout else 0
+            if moved:
+                print(f"Storage migration: moved {moved} files to the '{STORAGE_LAYOUT}' layout.")
+            if ARCHIVE_AFTER_MONTHS:
+                db.archive_cold_months(ARCHIVE_AFTER_MONTHS)
+        except Exception as e:
+            print(f"Storage migration stopped: {e}")
+
+    thread = threading.Thread(target=releasing_db(migrate), daemon=True)
+    thread.start()
+    return thread
+
+def reconcile_journal() -> None:
+    """
+    Settle groups an interrupted run left between moving files and inserting the row:
+    fully moved groups get their row, the rest have their files moved back.
+    """
+    db, journal = get_db(), get_journal()
+    for base, state, record in journal.unfinished_moves():
+        if state == MOVED:
+            try:
+                db.write_record(record, commit=False)
+                journal.mark_inserted(base, db.conn)
+                db.commit()
+                print(f"Recovered group '{base}' from the journal.")
+                continue
+            except Exception as e:
+                db.rollback()
+                print(f"Could not recover group '{base}' ({e}); returning its files.")
+        db.unstore_record(record)
+        journal.reset_move(base)
+
+class StageStats:
+    """Items handled and busy time of one pipeline stage."""
+
+    def __init__(self, name):
+        self.name = name
+        self.items = 0
+        self.busy = 0.0
+        self._started = None
+
+    def __enter__(self):
+        self._started = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.busy += time.perf_counter() - self._started
+
+    def report(self, elapsed):
+        rate = self.items / self.busy if self.busy else 0.0
+        print(f"  {self.name:<8} {self.items:6d} items, busy {self.busy:7.2f}s of {elapsed:7.2f}s ({rate:8.1f}/s busy)")
+
+def run_pipeline(pairs: dict, total_groups: int, progress_callback=None) -> int:
+    """
+    Ingest {doc_path: (base, audio_path)} pairs through three stages connected
+    by bounded queues:
+      1. extract: PDFs parsed on a process pool, results validated here
+      2. move: record IDs reserved and both files moved into db_files
+      3. write: a single DB writer inserting rows WRITE_BATCH_SIZE per transaction
+    Every stage checkpoints the group in the journal; groups an earlier run already
+    extracted skip straight to the move stage.
+    progress_callback(processed, total) is called from the writer after each
+    committed row. Returns the number of groups stored.
+    """
+    db, journal = get_db(), get_journal()
+    resumed = journal.discover(pairs)
+    move_queue = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    write_queue = queue.Queue(maxsize=PIPELINE_QUEUE_SIZE)
+    extract_stats, move_stats, write_stats = StageStats("extract"), StageStats("move"), StageStats("write")
+    processed = [0]
+
+    def move_stage():
+        while True:
+            item = move_queue.get()
+            if item is None:
+                write_queue.put(None)
+                return
+            base, doc_file, audio_file, info = item
+            try:
+                with move_stats:
+                    record = move_group(base, doc_file, audio_file, info)
+                    move_stats.items += 1
+                write_queue.put((base, record))
+            except Exception as e:
+                print(f"Error processing group '{base}': {e}")
+
+    def write_rows(batch):
+        """Insert the batch one row per savepoint and commit; return [(base, record, error)] of the rows that failed."""
+        failed = []
+        for base, record in batch:
+            try:
+                with db.savepoint():
+                    db.insert_records([record], commit=False)
+                    journal.mark_inserted(base, db.conn)
+            except Exception as e:
+                failed.append((base, record, e))
+        db.commit()
+        return failed
+
+    def write_batch(batch):
+        failed = []
+        try:
+            with write_stats:
+                try:
+                    db.insert_records([record for _, record in batch], commit=False)
+                    for base, _ in batch:
+                        journal.mark_inserted(base, db.conn)
+                    db.commit()
+                except Exception:
+                    # One bad row must not fail the rest of the batch: retry row by row
+                    db.rollback()
+                    failed = write_rows(batch)
+                write_stats.items += len(batch) - len(failed)
+        except Exception as e:
+            db.rollback()
+            failed = [(base, record, e) for base, record in batch]
+        for base, record, e in failed:
+            print(f"Error processing group '{base}': {e}")
+            db.unstore_record(record)
+            journal.reset_move(base)
+        failed_bases = {base for base, _, _ in failed}
+        for base, record in batch:
+            if base in failed_bases:
+                continue
+            processed[0] += 1
+            print(f"Record inserted successfully for patient: {record['patient_name']}.")
+            print(f"Processed group '{base}'.")
+            if progress_callback:
+                progress_callback(processed[0], total_groups)
+
+    def write_stage():
+        finished = False
+        while not finished:
+            batch = []
+            item = write_queue.get()
+            # Take whatever else is already waiting, up to one batch
+            while item is not None:
+                batch.append(item)
+                if len(batch) >= WRITE_BATCH_SIZE:
+                    break
+                try:
+                    item = write_queue.get_nowait()
+                except queue.Empty:
+                    break
+            finished = item is None
+            if batch:
+                write_batch(batch)
+
+    started = time.perf_counter()
+    # Each run starts new stage threads: they close their connections when they end
+    threads = [
+        threading.Thread(target=releasing_db(move_stage), daemon=True),
+        threading.Thread(target=releasing_db(write_stage), daemon=True),
+    ]
+    for thread in threads:
+        thread.start()
+
+    # PDF parsing is CPU-bound: extract on a process pool, pass results on as they arrive
+    try:
+        if resumed:
+            print(f"Resuming {len(resumed)} groups extracted by an earlier run.")
+        for doc_file, info in resumed.items():
+            base, audio_file = pairs[doc_file]
+            move_queue.put((base, doc_file, audio_file, info))
+        to_extract = [doc_file for doc_file in pairs if doc_file not in resumed]
+        # Report bodies are stored for full-text search
+        results = get_requested_info_many(to_extract, workers=EXTRACTION_WORKERS, include_body=True)
+        while True:
+            with extract_stats:
+                try:
+                    doc_file, info = next(results)
+                except StopIteration:
+                    break
+            base, audio_file = pairs[doc_file]
+            try:
+                if isinstance(info, Exception):
+                    raise info
+                validate_info(info)
+            except Exception as e:
+                print(f"Error processing group '{base}': {e}")
+                continue
+            extract_stats.items += 1
+            journal.mark_extracted(base, info)
+            move_queue.put((base, doc_file, audio_file, info))
+    finally:
+        move_queue.put(None)
+        for thread in threads:
+            thread.join()
+
+    elapsed = time.perf_counter() - started
+    print("Pipeline throughput:")
+    for stats in (extract_stats, move_stats, write_stats):
+        stats.report(elapsed)
+    return processed[0]
+
 def main(progress_callback=None):
     print("Starting file handler for batch processing.")
+    reconcile_journal()
 
     all_files = [os.path.join(receiver_folder, f) for f in os.listdir(receiver_folder)]
     if not all_files:
@@ -75,8 +374,9 @@ def main(progress_callback=None):
         groups.setdefault(base, []).append(f)
 
     total_groups = len(groups)
-    processed_groups = 0
 
+    # Map each document to its group so extraction results can be matched back
+    pairs = {}
     for base, files in groups.items():
         if len(files) != 2:
             print(f"Error: File group '{base}' does not have exactly 2 files.")
@@ -91,23 +391,55 @@ def main(progress_callback=None):
                 doc_file = f
 
         if audio_file and doc_file:
-            try:
-                process_two_files(doc_file, audio_file)
-                processed_groups += 1
-                print(f"Processed group '{base}'.")
-                if progress_callback:
-                    progress_callback(processed_groups, total_groups)
-            except Exception as e:
-                print(f"Error processing group '{base}': {e}")
+            pairs[doc_file] = (base, audio_file)
+
+    processed_groups = run_pipeline(pairs, total_groups, progress_callback)
 
     print(f"Batch processing complete. Processed {processed_groups} groups out of {total_groups}.")
-    db.close()
+    stats = template_stats()
+    print(f"Template fast path: {stats['hits']} hits, {stats['misses']} misses "
+          f"({stats['hit_rate']:.0%} hit rate).")
+
+def watch(stop_event=None, progress_callback=None):
+    """
+    Watch receiver_folder and store each document/audio pair as soon as both
+    files have finished arriving, until stop_event is set (or Ctrl+C).
+    progress_callback(processed, processed) is called after each stored pair.
+    """
+    if stop_event is None:
+        stop_event = threading.Event()
+    reconcile_journal()
+    processed = [0]
 
+    def on_pair(doc_path, audio_path):
+        base = Path(doc_path).stem
+        try:
+            process_two_files(doc_path, audio_path)
+        except Exception as e:
+            print(f"Error processing group '{base}': {e}")
+            return
+        processed[0] += 1
+        print(f"Processed group '{base}'.")
+        if progress_callback:
+            progress_callback(processed[0], processed[0])
 
-def process_matched_files(pdf_path, audio_path, is_ambulatorio=False, is_multiples_audios=False):
+    watcher = ReceiverWatcher(
+        receiver_folder, on_pair, DOC_EXTENSIONS, AUDIO_EXTENSIONS,
+        stable_seconds=WATCH_STABLE_SECONDS, poll_interval=WATCH_POLL_INTERVAL
+    )
+    print(f"Watching {receiver_folder} for new files.")
+    try:
+        watcher.run(stop_event)
+    except KeyboardInterrupt:
+        pass
+    print(f"Watch mode stopped. Processed {processed[0]} groups.")
+
+
+def process_matched_files(pdf_path, audio_path, is_ambulatorio=False, is_multiples_audios=False, info=None):
     """
     Processes the matched PDF and audio files:
-      - Extracts PDF info using get_requested_info().
+      - Extracts PDF info using get_requested_info(), unless the caller already
+        has it (info).
       - Uses the 'Patient ID' and 'Patient Name' (with spaces replaced by underscores)
         and the current date/time to build unique filenames.
       - If is_ambulatorio == True, prepend "AMBULATORIO" to the filename, and
@@ -117,7 +449,8 @@ def process_matched_files(pdf_path, audio_path, is_ambulatorio=False, is_multipl
     """
 
     # Extract PDF info
-    info = get_requested_info(pdf_path)
+    if info is None:
+        info = get_requested_info(pdf_path)
     patient_id = info.get("Patient ID", "unknown").strip().replace(" ", "_")
     patient_name = info.get("Patient Name", "unknown").strip().replace(" ", "_")
     exam_type = info.get("Exam Type", "estudio_desconocido").strip().replace(" ", "_")
@@ -164,4 +497,15 @@ def process_matched_files(pdf_path, audio_path, is_ambulatorio=False, is_multipl
 
 
 if __name__ == "__main__":
-    main()
+    if "--watch" in sys.argv[1:]:
+        watch()
+    elif "--migrate-storage" in sys.argv[1:]:
+        start_storage_migration().join()
+    elif "--verify-archives" in sys.argv[1:]:
+        problems = get_db().verify_archives()
+        for path, error in problems:
+            print(f"{path}: {error}")
+        print(f"Archive verification: {len(problems)} problems found.")
+        sys.exit(1 if problems else 0)
+    else:
+        main()
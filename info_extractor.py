@@ -1,10 +1,25 @@
-import PyPDF2
+import bisect
+import hashlib
 import os
 import re
 import unicodedata
 from datetime import datetime
 
+from extraction_cache import ExtractionCache, file_sha256
+from pdf_backends import BACKENDS, FastDecodeError
+
 # ------------------ CONFIG / DICTIONARIES ------------------ #
+# Bump whenever parsing changes so stale cached results are not reused
+EXTRACTOR_VERSION = "5"
+
+# Persistent extraction cache, disabled until enable_extraction_cache() is called
+_extraction_cache = None
+
+# Text backend: "pypdf2", "raw" (simple Flate content streams only) or "auto"
+# (raw first, PyPDF2 whenever the raw output is missing a required field).
+# The raw decoder is opt-in: a wrong but complete decode would be accepted and cached
+PDF_BACKEND = "pypdf2"
+
 TRANSCRIBER_TOKENS = {
     "JENIFFER": "GALVIS MORALES JENIFFER",
     "CAROLINA": "GALVIS PEREZ DIANA CAROLINA",
@@ -81,11 +96,72 @@ doctor_map = {
 }
 
 # ------------------ HELPERS ------------------ #
+class _AccentStripTable(dict):
+    """
+    str.translate() table that decomposes each character the first time it is seen
+    and memoizes the result, so remove_accents() runs at C speed on repeated text.
+    """
+
+    def __missing__(self, codepoint):
+        stripped = ''.join(
+            c for c in unicodedata.normalize('NFKD', chr(codepoint))
+            if unicodedata.category(c) != 'Mn'
+        )
+        self[codepoint] = stripped
+        return stripped
+
+_ACCENT_STRIP_TABLE = _AccentStripTable()
+
 def remove_accents(s: str) -> str:
-    return ''.join(
-        c for c in unicodedata.normalize('NFKD', s)
-        if unicodedata.category(c) != 'Mn'
-    )
+    # NFKD leaves ASCII untouched, so skip the translation for plain text
+    if s.isascii():
+        return s
+    return s.translate(_ACCENT_STRIP_TABLE)
+
+class KeywordMatcher:
+    """
+    Keyword lookup over (keyword, value) entries given in priority order.
+
+    Keywords are normalized once and compiled into a single alternation, so a lookup
+    only normalizes the text and scans it once. Each alternative is a capturing group
+    inside a lookahead, listed in priority order: at every position the highest-priority
+    keyword starting there matches, overlaps included, and the lowest group number seen
+    over the text gives the same answer as the old nested loops.
+    """
+
+    def __init__(self, entries, normalize):
+        keywords, values = [], []
+        for keyword, value in entries:
+            keyword = normalize(keyword)
+            if keyword not in keywords:     # A repeated keyword can never win
+                keywords.append(keyword)
+                values.append(value)
+        self._values = tuple(values)
+        self._pattern = re.compile("(?=" + "|".join(f"({re.escape(kw)})" for kw in keywords) + ")")
+
+    def find(self, normalized_text: str) -> str:
+        """Return the value of the highest-priority keyword found in the text, or ""."""
+        best = None
+        for match in self._pattern.finditer(normalized_text):
+            if best is None or match.lastindex < best:
+                best = match.lastindex
+                if best == 1:
+                    break
+        return "" if best is None else self._values[best - 1]
+
+# Built once at import, in the same priority order the dictionaries define
+TRANSCRIBER_MATCHER = KeywordMatcher(
+    [(token, full_name) for token, full_name in TRANSCRIBER_TOKENS.items()],
+    lambda kw: remove_accents(kw).upper()
+)
+EXAM_MATCHER = KeywordMatcher(
+    [(kw, exam_key) for exam_key, keywords in EXAM_TYPES.items() for kw in keywords],
+    lambda kw: remove_accents(kw).upper()
+)
+DOCTOR_MATCHER = KeywordMatcher(
+    [(kw, doctor_name) for doctor_name, keywords in doctor_map.items() for kw in keywords],
+    lambda kw: remove_accents(kw).lower()
+)
 
 def extract_patient_id(documento_text: str) -> str:
     """
@@ -97,12 +173,7 @@ def extract_patient_id(documento_text: str) -> str:
     return match.group(1) if match else ""
 
 def find_transcriber_any_token(transcripcion: str) -> str:
-    trans_norm = remove_accents(transcripcion).upper()
-    for token, full_name in TRANSCRIBER_TOKENS.items():
-        token_norm = remove_accents(token).upper()
-        if token_norm in trans_norm:
-            return full_name
-    return ""
+    return TRANSCRIBER_MATCHER.find(remove_accents(transcripcion).upper())
 
 def find_transcription_date(transcripcion: str) -> str:
     """
@@ -116,61 +187,222 @@ def find_exam_type(procedimiento: str) -> str:
     Return the exam type from EXAM_TYPES if any of its keywords 
     appear in the 'procedimiento' text. Otherwise, return empty.
     """
-    proc_norm = remove_accents(procedimiento).upper()
-    for exam_key, keywords in EXAM_TYPES.items():
-        for kw in keywords:
-            kw_norm = remove_accents(kw).upper()
-            if kw_norm in proc_norm:
-                return exam_key
-    return ""
+    return EXAM_MATCHER.find(remove_accents(procedimiento).upper())
 
 def identify_doctor(paragraph_text: str) -> str:
-    normalized = remove_accents(paragraph_text).lower()
-    for doctor_name, keywords in doctor_map.items():
-        for kw in keywords:
-            kw_norm = remove_accents(kw).lower()
-            if kw_norm in normalized:
-                return doctor_name
+    return DOCTOR_MATCHER.find(remove_accents(paragraph_text).lower())
+
+def find_doctor_in_paragraphs(paragraphs: list) -> str:
+    """
+    Return the doctor named in the last paragraph that names one. Scanning bottom-up
+    stops at the signature, so only the paragraphs below it are ever normalized.
+    """
+    for p in reversed(paragraphs):
+        doctor_found = identify_doctor(p)
+        if doctor_found:
+            return doctor_found
     return ""
 
 # ------------------ NEW: Robust Header Extraction ------------------ #
+# Known header labels (accent-stripped, lowercase) and the field each one fills
+HEADER_LABELS = {
+    "paciente": "paciente",
+    "documento": "documento",
+    "entidad": "entidad",
+    "procedimiento": "procedimiento",
+    "fecha": "fecha",
+    "remision": "nro_remision",       # preceded by "nro"
+    "transcripcion": "transcripcion",
+}
+HEADER_FIELDS = ("paciente", "documento", "entidad", "procedimiento", "fecha", "nro_remision", "transcripcion")
+FECHA_VALUE_RE = re.compile(r"\d{2}/\d{2}/\d{4}")
+
+def _is_word_char(c: str) -> bool:
+    # Same characters as \w in a str pattern
+    return c.isalnum() or c == "_"
+
+def _label_for_word(text: str, word_start: int, word_end: int) -> str:
+    """Return the field whose label ends the word text[word_start:word_end], or ""."""
+    for label, field in HEADER_LABELS.items():
+        label_start = word_end - len(label)
+        if label_start < word_start or not text.startswith(label, label_start):
+            continue
+        if field != "nro_remision":
+            return field
+        # "nro" + whitespace must come right before "remision"
+        i = label_start
+        while i > 0 and text[i - 1].isspace():
+            i -= 1
+        if i < label_start and i >= 3 and text.startswith("nro", i - 3):
+            return field
+    return ""
+
 def extract_header_fields(header_text: str) -> dict:
     """
     Extract header fields from a block of text, allowing multi-line field values.
+
+    Single pass tokenizer: every "word :" in the header is located from its colon,
+    known labels start a field, and each value runs until the next "word :" that is
+    preceded by whitespace (known label or not, e.g. "Sexo :"). The first occurrence
+    of each label wins; "fecha" only counts when followed by a DD/MM/YYYY date.
     """
-    fields = {}
-    norm_header = remove_accents(header_text).lower()
-
-    patterns = {
-        "paciente": r"paciente\s*:\s*(.*?)(?=\s+\w+\s*:|$)",
-        "documento": r"documento\s*:\s*(.*?)(?=\s+\w+\s*:|$)",
-        "entidad": r"entidad\s*:\s*(.*?)(?=\s+\w+\s*:|$)",
-        "procedimiento": r"procedimiento\s*:\s*(.*?)(?=\s+\w+\s*:|$)",
-        "fecha": r"fecha\s*:\s*(\d{2}/\d{2}/\d{4})",
-        "nro_remision": r"nro\s+remisi(?:o|ó)n\s*:\s*(.*?)(?=\s+\w+\s*:|$)",
-        "transcripcion": r"transcripci(?:o|ó)n\s*:\s*(.*?)(?=\s+\w+\s*:|$)"
-    }
+    text = remove_accents(header_text).lower()
+    labels = []         # (field, value start)
+    boundaries = []     # start of the whitespace run before each "word :"
+    colon = text.find(":")
+    while colon != -1:
+        word_end = colon
+        while word_end > 0 and text[word_end - 1].isspace():
+            word_end -= 1
+        word_start = word_end
+        while word_start > 0 and _is_word_char(text[word_start - 1]):
+            word_start -= 1
+        if word_start < word_end:
+            run_start = word_start
+            while run_start > 0 and text[run_start - 1].isspace():
+                run_start -= 1
+            if run_start < word_start:
+                boundaries.append(run_start)
+            field = _label_for_word(text, word_start, word_end)
+            if field:
+                value_start = colon + 1
+                while value_start < len(text) and text[value_start].isspace():
+                    value_start += 1
+                labels.append((field, value_start))
+        colon = text.find(":", colon + 1)
+
+    found = {}
+    for field, value_start in labels:
+        if field in found:
+            continue
+        if field == "fecha":
+            date = FECHA_VALUE_RE.match(text, value_start)
+            if date:
+                found[field] = date.group(0)
+            continue
+        next_boundary = bisect.bisect_left(boundaries, value_start)
+        value_end = boundaries[next_boundary] if next_boundary < len(boundaries) else len(text)
+        # Normalize whitespace and drop a dangling " -" separator before the next label
+        found[field] = " ".join(text[value_start:value_end].split()).rstrip(" -")
 
-    # Use re.DOTALL to capture across multiple lines
-    for field, pattern in patterns.items():
-        match = re.search(pattern, norm_header, flags=re.IGNORECASE | re.DOTALL)
+    return {field: found[field] for field in HEADER_FIELDS if field in found}
+
+# ------------------ TEMPLATE FINGERPRINTING ------------------ #
+# A run that starts with a known label ("Paciente :", "Nro remision :", ...)
+ANCHOR_RE = re.compile(
+    r"\s*(?:(?P<paciente>paciente)|(?P<documento>documento)|(?P<entidad>entidad)"
+    r"|(?P<procedimiento>procedimiento)|(?P<fecha>fecha)|(?P<nro_remision>nro\s+remision)"
+    r"|(?P<transcripcion>transcripcion))\s*:\s*"
+)
+VALUE_BOUNDARY_RE = re.compile(r"\s+\w+\s*:")
+
+# fingerprint -> tuple of fields extracted positionally, or None if the layout
+# was seen but its runs do not reproduce the general pipeline's output
+_template_plans = {}
+TEMPLATE_STATS = {"hits": 0, "misses": 0}
+
+def layout_fingerprint(runs) -> str:
+    """
+    Identify a report template from its first page: the sequence of header
+    labels with their font and (rounded) position. Returns "" if no label is found.
+    """
+    anchors = []
+    for run in runs:
+        match = ANCHOR_RE.match(remove_accents(run.text).lower())
         if match:
-            fields[field] = " ".join(match.group(1).split())  # Normalize whitespace
+            anchors.append(f"{match.lastgroup}|{run.font}|{round(run.x)}|{round(run.y)}")
+    if not anchors:
+        return ""
+    return hashlib.sha1("\n".join(anchors).encode("utf-8")).hexdigest()
+
+def _fields_from_runs(runs) -> dict:
+    """
+    Positional header extraction: each label run starts a field and the runs
+    drawn after it (up to the next label run or the header delimiter) hold its value.
+    """
+    parts = {}
+    current = None
+    previous_y = None
+    for run in runs:
+        text = remove_accents(run.text).lower()
+        if HEADER_DELIMITER_RE.search(text):
+            break
+        match = ANCHOR_RE.match(text)
+        if match:
+            # First occurrence of a label wins, like the tokenizer
+            current = match.lastgroup if match.lastgroup not in parts else None
+            if current:
+                parts[current] = []
+            text = text[match.end():]
+        if current:
+            # Runs on the same baseline continue a line; a new baseline is a new line
+            parts[current].append(text if run.y == previous_y else " " + text)
+        previous_y = run.y
+
+    fields = {}
+    for field in HEADER_FIELDS:
+        if field not in parts:
+            continue
+        value = "".join(parts[field])
+        if field == "fecha":
+            date = FECHA_VALUE_RE.match(value.strip())
+            if date:
+                fields[field] = date.group(0)
+            continue
+        boundary = VALUE_BOUNDARY_RE.search(value)
+        if boundary:
+            value = value[:boundary.start()]
+        fields[field] = " ".join(value.split()).rstrip(" -")
     return fields
 
+def _template_header_fields(fingerprint: str, runs):
+    """
+    Fast path: header fields for a known template, or None (a miss) when the
+    layout is unknown or the positional plan did not find every planned field.
+    """
+    plan = _template_plans.get(fingerprint) if fingerprint else None
+    if plan:
+        fields = _fields_from_runs(runs)
+        if all(fields.get(field) for field in plan):
+            TEMPLATE_STATS["hits"] += 1
+            return {field: fields[field] for field in HEADER_FIELDS if field in fields}
+    TEMPLATE_STATS["misses"] += 1
+    return None
+
+def _learn_template(fingerprint: str, runs, header_fields: dict) -> None:
+    """
+    Register the plan for a new layout, only if positional extraction reproduces
+    exactly what the general pipeline found on this document.
+    """
+    if not fingerprint or fingerprint in _template_plans:
+        return
+    fields = _fields_from_runs(runs)
+    usable = bool(header_fields) and fields == header_fields
+    _template_plans[fingerprint] = tuple(field for field in HEADER_FIELDS if field in fields) if usable else None
+
+def template_stats() -> dict:
+    """Template fast-path counters: hits, misses, hit_rate and known templates."""
+    total = TEMPLATE_STATS["hits"] + TEMPLATE_STATS["misses"]
+    return {
+        "hits": TEMPLATE_STATS["hits"],
+        "misses": TEMPLATE_STATS["misses"],
+        "hit_rate": TEMPLATE_STATS["hits"] / total if total else 0.0,
+        "templates": sum(1 for plan in _template_plans.values() if plan),
+    }
+
 # ------------------ PARSING THE PDF ------------------ #
-def extract_text_from_pdf(file_path: str) -> str:
-    text = ""
-    with open(file_path, "rb") as f:
-        pdf = PyPDF2.PdfReader(f)
-        for page in pdf.pages:
-            page_text = page.extract_text()
-            if page_text:
-                text += page_text + "\n"
-    return text
-
-def parse_pdf_file(file_path: str) -> dict:
-    fields = {
+HEADER_DELIMITER_RE = re.compile(r'\b(hallazgos|tecnica|conclusion)\b')
+SIGNATURE_RE = re.compile(r'^(atte|atentamente|dra\.|dr\.)')
+
+def _text_to_paragraphs(text: str) -> list:
+    # Split the text into lines, treating each as a paragraph (adjust as needed)
+    return [line for line in text.splitlines() if line.strip()]
+
+def _is_header_delimiter(paragraph: str) -> bool:
+    return HEADER_DELIMITER_RE.search(remove_accents(paragraph).lower()) is not None
+
+def _empty_fields() -> dict:
+    return {
         "paciente": "",
         "documento": "",
         "entidad": "",
@@ -181,16 +413,58 @@ def parse_pdf_file(file_path: str) -> dict:
         "content_after_bars": "",
         "doctor": ""
     }
+
+# Fields the raw decoder must produce for "auto" to accept its output
+FAST_REQUIRED_FIELDS = ("paciente", "documento", "procedimiento", "fecha", "transcripcion", "doctor")
+
+def set_pdf_backend(name: str) -> None:
+    """Select the text backend used by parse_pdf_file(): "auto", "pypdf2" or "raw"."""
+    global PDF_BACKEND
+    if name != "auto" and name not in BACKENDS:
+        raise ValueError(f"Unknown PDF backend: {name}")
+    PDF_BACKEND = name
+
+def parse_pdf_file(file_path: str, header_only: bool = False, backend: str = None) -> dict:
+    """
+    Parse the header fields, report body and signing doctor of the PDF.
+
+    With header_only=True the body is skipped: pages are read lazily until the
+    header delimiter is found, then only the last page(s) are read for the doctor.
+    backend overrides PDF_BACKEND for this call.
+    """
+    backend = backend or PDF_BACKEND
+    if backend != "auto":
+        return _parse_with_backend(file_path, header_only, backend)
+
+    try:
+        fields = _parse_with_backend(file_path, header_only, "raw")
+        if all(fields[field] for field in FAST_REQUIRED_FIELDS):
+            return fields
+    except FastDecodeError:
+        pass
+    return _parse_with_backend(file_path, header_only, "pypdf2")
+
+def _parse_with_backend(file_path: str, header_only: bool, backend: str) -> dict:
+    with BACKENDS[backend].open(file_path) as document:
+        if header_only:
+            return _parse_pdf_header(document)
+        return _parse_pdf_document(document)
+
+def _parse_pdf_document(document) -> dict:
+    fields = _empty_fields()
     
-    pdf_text = extract_text_from_pdf(file_path)
-    # Split the text into lines, treating each as a paragraph (adjust as needed)
-    paragraphs = [line for line in pdf_text.splitlines() if line.strip()]
+    pdf_text = "".join(
+        page_text + "\n"
+        for page_text in (document.page_text(index) for index in range(document.page_count))
+        if page_text
+    )
+    paragraphs = _text_to_paragraphs(pdf_text)
     
     # 1) Collect header paragraphs up until a known delimiter (e.g., HALLAZGOS, TÉCNICA, CONCLUSIÓN)
     header_lines = []
     delimiter_found = False
     for p in paragraphs:
-        if re.search(r'\b(hallazgos|tecnica|conclusion)\b', remove_accents(p).lower()):
+        if _is_header_delimiter(p):
             delimiter_found = True
             break
         header_lines.append(p)
@@ -202,17 +476,62 @@ def parse_pdf_file(file_path: str) -> dict:
     body_lines = []
     start_index = len(header_lines) if delimiter_found else 0
     for p in paragraphs[start_index:]:
-        if re.search(r'^(atte|atentamente|dra\.|dr\.)', remove_accents(p).lower()):
+        if SIGNATURE_RE.search(remove_accents(p).lower()):
             break
         body_lines.append(p.strip())
     fields["content_after_bars"] = "\n".join(body_lines).strip()
     
     # 3) Identify doctor from bottom-up (using all paragraphs)
-    for p in reversed(paragraphs):
-        doctor_found = identify_doctor(p)
+    fields["doctor"] = find_doctor_in_paragraphs(paragraphs)
+
+    return fields
+
+def _parse_pdf_header(document) -> dict:
+    """
+    Early-stopping variant of _parse_pdf_document: same header fields and doctor,
+    no report body. Multi-page reports cost about the same as one-page ones, and
+    first pages matching a known template skip the paragraph/tokenizer pipeline.
+    """
+    fields = _empty_fields()
+    if document.page_count == 0:
+        return fields
+    page_paragraphs = {}
+
+    # 1) Known templates: header fields straight from the first page's text runs
+    first_page_text, runs = document.first_page_runs()
+    page_paragraphs[0] = _text_to_paragraphs(first_page_text)
+    fingerprint = layout_fingerprint(runs)
+    header_fields = _template_header_fields(fingerprint, runs)
+
+    if header_fields is None:
+        # Otherwise read pages in order only until the header delimiter shows up
+        header_lines = []
+        delimiter_found = False
+        for index in range(document.page_count):
+            paragraphs = page_paragraphs.get(index)
+            if paragraphs is None:
+                paragraphs = _text_to_paragraphs(document.page_text(index))
+                page_paragraphs[index] = paragraphs
+            for p in paragraphs:
+                if _is_header_delimiter(p):
+                    delimiter_found = True
+                    break
+                header_lines.append(p)
+            if delimiter_found:
+                break
+        header_fields = extract_header_fields(" ".join(header_lines))
+        _learn_template(fingerprint, runs, header_fields)
+    fields.update(header_fields)
+
+    # 2) Identify doctor from bottom-up, reading pages from the last one backwards
+    for index in reversed(range(document.page_count)):
+        paragraphs = page_paragraphs.get(index)
+        if paragraphs is None:
+            paragraphs = _text_to_paragraphs(document.page_text(index))
+        doctor_found = find_doctor_in_paragraphs(paragraphs)
         if doctor_found:
             fields["doctor"] = doctor_found
-            break
+            return fields
 
     return fields
 
@@ -240,7 +559,104 @@ def print_requested_fields(info: dict) -> None:
     print(f"Patient ID: {patient_id}")
     print()  # blank line
 
-def get_requested_info(file_path: str) -> dict:
+def enable_extraction_cache(cache_path: str, max_entries: int = 50000) -> None:
+    """
+    Turn on the persistent extraction cache stored at cache_path. Once enabled,
+    get_requested_info() only parses documents whose content it has not seen before.
+    Enabling the cache that is already on does nothing.
+    """
+    global _extraction_cache
+    if (_extraction_cache is not None and _extraction_cache.db_path == cache_path
+            and _extraction_cache.max_entries == max_entries):
+        return
+    _extraction_cache = ExtractionCache(cache_path, max_entries=max_entries)
+
+def get_requested_info(file_path: str, include_body: bool = False) -> dict:
+    """
+    Return the requested info for the PDF, served from the extraction cache when
+    the same content (under any file name) was already parsed by this extractor version.
+    With include_body=True the report body is parsed too and returned as 'Report Text'.
+
+    The cache holds one full parse (body included) per content, so a document
+    checked on the verify screen is not parsed again when the batch stores it.
+    """
+    if _extraction_cache is None:
+        return _extract_requested_info(file_path, include_body)
+
+    # Backends may lay text out slightly differently: keep their results apart
+    version = f"{EXTRACTOR_VERSION}/{PDF_BACKEND}"
+    content_hash = file_sha256(file_path)
+    info = _extraction_cache.get(content_hash, version)
+    if info is None:
+        info = _extract_requested_info(file_path, include_body=True)
+        _extraction_cache.put(content_hash, version, info)
+    if not include_body:
+        del info["Report Text"]
+    return info
+
+def _init_extraction_worker(cache_path, max_entries, backend) -> None:
+    # Worker processes start with a fresh module state: share the parent's settings
+    set_pdf_backend(backend)
+    if cache_path:
+        enable_extraction_cache(cache_path, max_entries=max_entries)
+
+def _extract_chunk(file_paths: list, include_body: bool = False) -> tuple:
+    """
+    Extract a chunk of paths. Returns the (path, result) list and how much the
+    template counters moved, so a pool worker can report them to the parent.
+    """
+    stats_before = dict(TEMPLATE_STATS)
+    results = []
+    for file_path in file_paths:
+        try:
+            results.append((file_path, get_requested_info(file_path, include_body)))
+        except Exception as e:
+            results.append((file_path, e))
+    stats_delta = {key: TEMPLATE_STATS[key] - stats_before[key] for key in TEMPLATE_STATS}
+    return results, stats_delta
+
+def get_requested_info_many(file_paths, workers: int = None, chunk_size: int = 1, include_body: bool = False):
+    """
+    Extract many PDFs in parallel on a process pool of `workers` processes
+    (default: one per CPU), submitting them `chunk_size` paths at a time.
+
+    Yields (file_path, result) tuples as they complete, in no particular order.
+    result is the same dict get_requested_info(file_path, include_body) returns,
+    or the exception it raised for that file.
+    """
+    file_paths = list(file_paths)
+    if not file_paths:
+        return
+
+    if workers == 1:
+        results, _ = _extract_chunk(file_paths, include_body)
+        for file_path, result in results:
+            yield file_path, result
+        return
+
+    # multiprocessing is only loaded once a batch actually needs worker processes
+    from concurrent.futures import ProcessPoolExecutor, as_completed
+    initargs = (
+        (_extraction_cache.db_path, _extraction_cache.max_entries, PDF_BACKEND)
+        if _extraction_cache is not None else (None, None, PDF_BACKEND)
+    )
+    executor = ProcessPoolExecutor(max_workers=workers, initializer=_init_extraction_worker, initargs=initargs)
+    try:
+        futures = [
+            executor.submit(_extract_chunk, file_paths[i:i + chunk_size], include_body)
+            for i in range(0, len(file_paths), chunk_size)
+        ]
+        for future in as_completed(futures):
+            results, stats_delta = future.result()
+            for key, delta in stats_delta.items():
+                TEMPLATE_STATS[key] += delta
+            for file_path, result in results:
+                yield file_path, result
+    finally:
+        # If the caller stops early, drop the chunks that have not started yet
+        executor.shutdown(wait=True, cancel_futures=True)
+
+def _extract_requested_info(file_path: str, include_body: bool = False) -> dict:
     """
     Parse the specified PDF document and return a dictionary with:
       - 'Patient Name'
@@ -253,8 +669,10 @@ def get_requested_info(file_path: str) -> dict:
     
     The Patient ID is extracted from the "documento" field by searching for any of the document
     types (e.g. CC, AS, PA, etc.) followed by its value.
+    With include_body=True, 'Report Text' holds the report body as well.
     """
-    info = parse_pdf_file(file_path)
+    # Unless the body is wanted, only header fields and the doctor are needed
+    info = parse_pdf_file(file_path, header_only=not include_body)
     
     patient_name = info.get("paciente", "").strip()
     creation_date = info.get("fecha", "").strip()
@@ -270,7 +688,7 @@ def get_requested_info(file_path: str) -> dict:
     documento_text = info.get("documento", "").strip()
     patient_id = extract_patient_id(documento_text)
 
-    return {
+    requested = {
         "Patient Name": patient_name,
         "Creation Date": creation_date,
         "Transcription Date": transcription_date,
@@ -279,6 +697,9 @@ def get_requested_info(file_path: str) -> dict:
         "Doctor": doctor,
         "Patient ID": patient_id
     }
+    if include_body:
+        requested["Report Text"] = info.get("content_after_bars", "")
+    return requested
 
 # ------------------ UNIT TESTS ------------------ #
 import unittest
@@ -312,6 +733,59 @@ class TestFieldExtraction(unittest.TestCase):
         self.assertEqual(fields["procedimiento"],
                          "ecografia de abdomen total (higado pancreas vesicula vias biliares rinones bazo grandes vasos pelvis y flancos)")
 
+    def test_remision_without_nro(self):
+        # A "nro" at the very end of the header must not count as the one before "remision"
+        fields = extract_header_fields(" remision : 123 Paciente : JOSE nro")
+        self.assertNotIn("nro_remision", fields)
+        self.assertEqual(fields["paciente"], "jose nro")
+
+class TestExtractionCacheEntries(unittest.TestCase):
+    def test_header_and_body_requests_share_one_entry(self):
+        global _extraction_cache
+        import tempfile
+        from pdf_backends import _build_pdf
+        header = (b"BT /F1 10 Tf 50 700 Td (Paciente : ROMERO) Tj 0 -14 Td (Documento : CC - 1006964711) Tj "
+                  b"0 -14 Td (Procedimiento : ECOGRAFIA DE ABDOMEN Fecha : 08/07/2024) Tj "
+                  b"0 -14 Td (Hallazgos) Tj 0 -14 Td (Higado normal) Tj 0 -14 Td (Dra. Lynda Carvajal) Tj ET")
+        backend = PDF_BACKEND
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "report.pdf")
+            with open(path, "wb") as f:
+                f.write(_build_pdf([header]))
+            set_pdf_backend("raw")
+            enable_extraction_cache(os.path.join(folder, "cache.db"))
+            try:
+                header_info = get_requested_info(path)
+                self.assertNotIn("Report Text", header_info)
+                self.assertEqual(header_info["Patient ID"], "1006964711")
+                # The verify screen's lookup already stored the body the batch needs
+                cached = _extraction_cache.get(file_sha256(path), f"{EXTRACTOR_VERSION}/raw")
+                self.assertIn("higado normal", cached["Report Text"].lower())
+                self.assertEqual(get_requested_info(path, include_body=True), cached)
+                self.assertEqual(dict(cached, **header_info), cached)
+            finally:
+                _extraction_cache = None
+                set_pdf_backend(backend)
+
+class TestKeywordMatchers(unittest.TestCase):
+    def test_priority_order(self):
+        # RESONANCIA is listed before COLANGIORESONANCIA, so it wins on overlap
+        self.assertEqual(find_exam_type("Colangioresonancia magnética"), "RESONANCIA")
+        self.assertEqual(find_exam_type("ECOGRAFÍAS DE TEJIDOS BLANDOS"), "ECOGRAFIA")
+        self.assertEqual(find_transcriber_any_token("Yaneth Tafur - 01/02/2024"), "TAFUR GONZALES SAMIR YANED")
+
+    def test_priority_wins_over_position(self):
+        matcher = KeywordMatcher([("RESONANCIA", "RM"), ("ANGIO", "ANGIO"), ("ECO", "ECO")], str.upper)
+        # The earlier, lower-priority keyword overlaps the later, higher-priority one
+        self.assertEqual(matcher.find("ANGIORESONANCIA"), "RM")
+        self.assertEqual(matcher.find("ECO Y ANGIO"), "ANGIO")
+        self.assertEqual(matcher.find("TAC"), "")
+
+    def test_doctor_bottom_up(self):
+        paragraphs = ["Se compara con estudio del Dr. Ruiz", "Atentamente,", "Dra. Lynda Carvajal"]
+        self.assertEqual(find_doctor_in_paragraphs(paragraphs), "LYNDA IVETTE CARVAJAL ACOSTA")
+        self.assertEqual(find_doctor_in_paragraphs(["sin firma"]), "")
+
 if __name__ == "__main__":
     folder_path = r"C:\Users\Usuario\Desktop\BUGGED_SAMPLES" # Adjust as needed
     # Uncomment the next line to run unit tests:
@@ -0,0 +1,156 @@
+import json
+import sqlite3
+import threading
+import time
+
+# Group states, in the order a batch run advances them
+DISCOVERED = "discovered"
+EXTRACTED = "extracted"
+MOVED = "moved"
+INSERTED = "inserted"
+
+
+class IngestJournal:
+    """
+    Write-ahead journal of batch ingestion, one row per file group (file stem).
+
+    Groups advance discovered -> extracted -> moved -> inserted. The extracted info
+    is saved so a restarted run does not parse the PDF again, and the planned record
+    (ID and db_files paths) is saved before any file is moved, so moves that never
+    reached the database can be finished or undone on the next start.
+
+    The journal lives in the reports database. It keeps its own connection so its
+    checkpoints never commit a half-written batch, except mark_inserted(), which
+    runs on the caller's connection so the row and its state commit together.
+    """
+
+    def __init__(self, db_path):
+        self.conn = sqlite3.connect(db_path, timeout=30, check_same_thread=False)
+        self._lock = threading.Lock()
+        with self._lock:
+            self.conn.execute('''
+                CREATE TABLE IF NOT EXISTS ingest_journal (
+                    group_base TEXT PRIMARY KEY,
+                    state TEXT NOT NULL,
+                    pdf_src_path TEXT NOT NULL,
+                    audio_src_path TEXT NOT NULL,
+                    info_json TEXT,
+                    record_json TEXT,
+                    updated_at REAL NOT NULL
+                );
+            ''')
+            self.conn.execute("CREATE INDEX IF NOT EXISTS idx_journal_state ON ingest_journal(state);")
+            self.conn.commit()
+
+    def _update(self, sql, values):
+        with self._lock:
+            self.conn.execute(sql, values)
+            self.conn.commit()
+
+    def discover(self, pairs):
+        """
+        Register {doc_path: (base, audio_path)} groups found in the receiver folder.
+        Unfinished groups with the same files keep their state; anything else starts
+        over as discovered. Returns {doc_path: info} for groups already extracted.
+        """
+        with self._lock:
+            pending = {
+                base: (state, pdf_src, audio_src, info_json)
+                for base, state, pdf_src, audio_src, info_json in self.conn.execute(
+                    "SELECT group_base, state, pdf_src_path, audio_src_path, info_json "
+                    "FROM ingest_journal WHERE state != ?;", (INSERTED,)
+                )
+            }
+            resumed = {}
+            now = time.time()
+            for doc_path, (base, audio_path) in pairs.items():
+                row = pending.get(base)
+                if row is not None and row[1:3] == (doc_path, audio_path):
+                    if row[0] == EXTRACTED and row[3]:
+                        resumed[doc_path] = json.loads(row[3])
+                    continue
+                self.conn.execute(
+                    "INSERT OR REPLACE INTO ingest_journal "
+                    "(group_base, state, pdf_src_path, audio_src_path, info_json, record_json, updated_at) "
+                    "VALUES (?, ?, ?, ?, NULL, NULL, ?);",
+                    (base, DISCOVERED, doc_path, audio_path, now)
+                )
+            self.conn.commit()
+        return resumed
+
+    def mark_extracted(self, base, info):
+        self._update(
+            "UPDATE ingest_journal SET state = ?, info_json = ?, updated_at = ? WHERE group_base = ?;",
+            (EXTRACTED, json.dumps(info), time.time(), base)
+        )
+
+    def mark_planned(self, base, record):
+        """Save the record about to be stored; must be called before its files are moved."""
+        self._update(
+            "UPDATE ingest_journal SET record_json = ?, updated_at = ? WHERE group_base = ?;",
+            (json.dumps(record), time.time(), base)
+        )
+
+    def mark_moved(self, base):
+        self._update(
+            "UPDATE ingest_journal SET state = ?, updated_at = ? WHERE group_base = ?;",
+            (MOVED, time.time(), base)
+        )
+
+    def mark_inserted(self, base, conn):
+        """
+        Mark the group inserted inside conn's open transaction (not committed here).
+        The saved info and record are dropped: the row now holds them.
+        """
+        conn.execute(
+            "UPDATE ingest_journal SET state = ?, info_json = NULL, record_json = NULL, updated_at = ? "
+            "WHERE group_base = ?;",
+            (INSERTED, time.time(), base)
+        )
+
+    def reset_move(self, base):
+        """Back to extracted once a group's files are back in the receiver folder."""
+        self._update(
+            "UPDATE ingest_journal SET state = ?, record_json = NULL, updated_at = ? WHERE group_base = ?;",
+            (EXTRACTED, time.time(), base)
+        )
+
+    def unfinished_moves(self):
+        """Return [(base, state, record)] for groups whose files may sit in db_files without a row."""
+        with self._lock:
+            rows = self.conn.execute(
+                "SELECT group_base, state, record_json FROM ingest_journal "
+                "WHERE state IN (?, ?) AND record_json IS NOT NULL;", (EXTRACTED, MOVED)
+            ).fetchall()
+        return [(base, state, json.loads(record_json)) for base, state, record_json in rows]
+
+    def close(self):
+        self.conn.close()
+
+
+# ------------------ UNIT TESTS ------------------ #
+import os
+import tempfile
+import unittest
+
+class TestIngestJournal(unittest.TestCase):
+    def test_resume_and_restart(self):
+        with tempfile.TemporaryDirectory() as folder:
+            journal = IngestJournal(os.path.join(folder, "reports.db"))
+            pairs = {"a.pdf": ("a", "a.mp3"), "b.pdf": ("b", "b.mp3")}
+            self.assertEqual(journal.discover(pairs), {})
+            journal.mark_extracted("a", {"Patient ID": "1"})
+            journal.mark_planned("b", {"id": 7})
+            # A second run resumes "a" without parsing it again
+            self.assertEqual(journal.discover(pairs), {"a.pdf": {"Patient ID": "1"}})
+            self.assertEqual(journal.unfinished_moves(), [])
+            journal.mark_extracted("b", {"Patient ID": "2"})
+            self.assertEqual(journal.unfinished_moves(), [("b", EXTRACTED, {"id": 7})])
+            journal.mark_inserted("a", journal.conn)
+            journal.conn.commit()
+            self.assertEqual(journal.conn.execute(
+                "SELECT state, info_json, record_json FROM ingest_journal WHERE group_base = 'a';"
+            ).fetchone(), (INSERTED, None, None))
+            # A new file group reusing a finished stem starts over
+            self.assertEqual(journal.discover({"a.pdf": ("a", "a.mp3")}), {})
+            journal.close()
@@ -1,23 +1,551 @@
 import sqlite3
+import hashlib
 import os
+import re
+import queue
 import shutil
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from datetime import date, datetime
 
-from info_extractor import get_requested_info  # Ensure this module is accessible
+from extraction_cache import file_sha256
+from file_archive import ArchiveError, copy_member, write_bundle
+from info_extractor import get_requested_info, remove_accents  # Ensure this module is accessible
+
+# Applied to every connection: WAL lets searches read while a batch writes, and with
+# synchronous=NORMAL a commit no longer waits on an fsync. Negative cache_size is KiB.
+CONNECTION_PRAGMAS = (
+    "PRAGMA journal_mode=WAL;",
+    "PRAGMA synchronous=NORMAL;",
+    "PRAGMA cache_size=-16000;",
+    "PRAGMA mmap_size=268435456;",
+)
+
+# Columns returned by search_database(), in the order of its result dicts
+RESULT_COLUMNS = (
+    "id", "patient_id", "patient_name", "medical_procedure", "procedure_date",
+    "transcriptor", "transcription_date", "doctor", "audio_file_path", "pdf_file_path",
+    "ambulatorio", "multiple_audios"
+)
+# Keys of the rows built by prepare_record()
+RECORD_COLUMNS = RESULT_COLUMNS + ("report_text",)
+# Shadow columns derived from the record at insert time, for indexed searches
+SHADOW_COLUMNS = ("patient_name_norm", "procedure_date_iso", "transcription_date_iso")
+INSERT_RECORD_SQL = (
+    f"INSERT INTO medical_reports ({', '.join(RECORD_COLUMNS + SHADOW_COLUMNS)}) "
+    f"VALUES ({', '.join('?' * len(RECORD_COLUMNS + SHADOW_COLUMNS))})"
+)
+
+# How search filters compare: "exact" and "prefix" can use the column indexes,
+# "contains" has to scan every row
+MATCH_MODES = ("exact", "prefix", "contains")
+
+def normalize_name(name):
+    """Uppercase, accent-free, single-spaced form stored in patient_name_norm."""
+    return " ".join(remove_accents(name).upper().split())
+
+def iso_date(value):
+    """
+    Return the YYYY-MM-DD form of a DD/MM/YYYY string (as extracted from the PDF
+    header), an ISO string or a date; "" if it is not a valid date.
+    """
+    if isinstance(value, date):
+        return value.strftime("%Y-%m-%d")
+    value = (value or "").strip()
+    for date_format in ("%d/%m/%Y", "%Y-%m-%d"):
+        try:
+            return datetime.strptime(value, date_format).strftime("%Y-%m-%d")
+        except ValueError:
+            pass
+    return ""
+
+def date_range_bounds(date_from=None, date_to=None):
+    """
+    ISO (from, to) bounds of a date-range search; a missing bound leaves that side
+    open. A bound that is not a valid date raises ValueError instead of widening
+    the range to every record.
+    """
+    bounds = []
+    for value, open_bound in ((date_from, "0001-01-01"), (date_to, "9999-12-31")):
+        bound = iso_date(value) if value else open_bound
+        if not bound:
+            raise ValueError(f"Invalid date {value!r}: use DD/MM/YYYY or YYYY-MM-DD")
+        bounds.append(bound)
+    return tuple(bounds)
+
+def shadow_values(record):
+    """Values of SHADOW_COLUMNS for a record dict."""
+    return (
+        normalize_name(record["patient_name"]),
+        iso_date(record["procedure_date"]),
+        iso_date(record["transcription_date"]),
+    )
+
+# Searchable fields: the column actually compared and how the search value is normalized
+SEARCH_COLUMNS = {
+    "patient_id": ("patient_id", str.strip),
+    "patient_name": ("patient_name_norm", normalize_name),
+    "transcription_date": ("transcription_date", str.strip),
+}
+
+def match_condition(column, value, mode="contains"):
+    """
+    Return (sql, params) comparing column to value. A prefix match is written as a
+    half-open range so it uses the column's index regardless of LIKE's case rules.
+    """
+    if mode == "exact":
+        return f"{column} = ?", [value]
+    if mode == "prefix":
+        if not value:
+            return "1", []
+        return f"{column} >= ? AND {column} < ?", [value, value[:-1] + chr(ord(value[-1]) + 1)]
+    if mode == "contains":
+        return f"{column} LIKE ?", [f"%{value}%"]
+    raise ValueError(f"Unknown match mode: {mode}")
+
+def _search_filters(filters, mode, alias=""):
+    """Build WHERE conditions for {field: value} filters, skipping empty values."""
+    conditions = []
+    values = []
+    for field, value in filters.items():
+        if not value:
+            continue
+        column, normalize = SEARCH_COLUMNS.get(field, (field, str))
+        sql, params = match_condition(alias + column, normalize(value), mode)
+        conditions.append(sql)
+        values.extend(params)
+    return conditions, values
+
+# Full-text index over names and report bodies. unicode61 with remove_diacritics
+# makes "hepatomegalia" match "HEPATOMEGALÍA"; the rows live in medical_reports only.
+FTS_SCHEMA = (
+    '''
+    CREATE VIRTUAL TABLE IF NOT EXISTS medical_reports_fts USING fts5(
+        patient_name, doctor, medical_procedure, report_text,
+        content='medical_reports', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    );
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS medical_reports_fts_insert AFTER INSERT ON medical_reports BEGIN
+        INSERT INTO medical_reports_fts(rowid, patient_name, doctor, medical_procedure, report_text)
+        VALUES (new.id, new.patient_name, new.doctor, new.medical_procedure, new.report_text);
+    END;
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS medical_reports_fts_delete AFTER DELETE ON medical_reports BEGIN
+        INSERT INTO medical_reports_fts(medical_reports_fts, rowid, patient_name, doctor, medical_procedure, report_text)
+        VALUES ('delete', old.id, old.patient_name, old.doctor, old.medical_procedure, old.report_text);
+    END;
+    ''',
+    # Recreated so databases from before it was limited to the indexed columns pick it up;
+    # path updates (e.g. migrate_storage) then leave the index alone
+    "DROP TRIGGER IF EXISTS medical_reports_fts_update;",
+    '''
+    CREATE TRIGGER medical_reports_fts_update
+    AFTER UPDATE OF patient_name, doctor, medical_procedure, report_text ON medical_reports BEGIN
+        INSERT INTO medical_reports_fts(medical_reports_fts, rowid, patient_name, doctor, medical_procedure, report_text)
+        VALUES ('delete', old.id, old.patient_name, old.doctor, old.medical_procedure, old.report_text);
+        INSERT INTO medical_reports_fts(rowid, patient_name, doctor, medical_procedure, report_text)
+        VALUES (new.id, new.patient_name, new.doctor, new.medical_procedure, new.report_text);
+    END;
+    ''',
+)
+# bm25() column weights: a hit in the patient name outranks one in the report body
+FTS_RANK = "bm25(medical_reports_fts, 10.0, 3.0, 3.0, 1.0)"
+
+FTS_RESULT_LIMIT = 200
+
+# Paginated searches: rows per page, and where estimate_count() stops counting
+SEARCH_PAGE_SIZE = 100
+COUNT_ESTIMATE_LIMIT = 10000
+
+def fts_query(text):
+    """Turn free text into an FTS5 query: every word must match, as a prefix."""
+    return " ".join(f'"{word}"*' for word in re.findall(r"\w+", text))
+
+# Read-only search connections skip journal_mode (they cannot change it) and refuse writes
+READER_PRAGMAS = CONNECTION_PRAGMAS[2:] + ("PRAGMA query_only=1;",)
+READ_POOL_SIZE = 4
+BUSY_TIMEOUT = 30
+# Result rows kept by SearchCache over all its queries; a larger single result is not cached
+SEARCH_CACHE_ROWS = 20000
+# Record IDs reserved per write to sqlite_sequence; unused ones are skipped when the app exits
+ID_BLOCK_SIZE = 64
+
+# How files are spread under db_files/audios and db_files/pdfs:
+#   "flat": all in one folder, "hash": ab/cd/ from the file name's SHA-1,
+#   "date": YYYY/MM/ from the procedure date,
+#   "content": one copy per distinct file, named and spread by its SHA-256
+STORAGE_LAYOUTS = ("flat", "hash", "date", "content")
+STORAGE_MIGRATION_BATCH = 500
+BLOB_NAME = re.compile(r"[0-9a-f]{64}")
+
+# Reference count of every stored path, kept by triggers in the same transaction as
+# the rows, so a content-addressed file shared by several records is never lost.
+# pending_blobs counts the records holding a content-addressed file that were stored
+# but not inserted yet: insert_records() hands each hold over to the row it inserts.
+STORED_FILES_SCHEMA = (
+    '''
+    CREATE TABLE IF NOT EXISTS stored_files (
+        path TEXT PRIMARY KEY,
+        refcount INTEGER NOT NULL
+    );
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS stored_files_insert AFTER INSERT ON medical_reports BEGIN
+        INSERT INTO stored_files(path, refcount) VALUES (new.audio_file_path, 1), (new.pdf_file_path, 1)
+        ON CONFLICT(path) DO UPDATE SET refcount = refcount + 1;
+    END;
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS stored_files_delete AFTER DELETE ON medical_reports BEGIN
+        UPDATE stored_files SET refcount = refcount - 1 WHERE path IN (old.audio_file_path, old.pdf_file_path);
+        DELETE FROM stored_files WHERE path IN (old.audio_file_path, old.pdf_file_path) AND refcount <= 0;
+    END;
+    ''',
+    '''
+    CREATE TRIGGER IF NOT EXISTS stored_files_update
+    AFTER UPDATE OF audio_file_path, pdf_file_path ON medical_reports BEGIN
+        UPDATE stored_files SET refcount = refcount - 1 WHERE path IN (old.audio_file_path, old.pdf_file_path);
+        DELETE FROM stored_files WHERE path IN (old.audio_file_path, old.pdf_file_path) AND refcount <= 0;
+        INSERT INTO stored_files(path, refcount) VALUES (new.audio_file_path, 1), (new.pdf_file_path, 1)
+        ON CONFLICT(path) DO UPDATE SET refcount = refcount + 1;
+    END;
+    ''',
+    '''
+    CREATE TABLE IF NOT EXISTS pending_blobs (
+        path TEXT PRIMARY KEY,
+        holds INTEGER NOT NULL
+    );
+    ''',
+)
+
+# Archive tier: files of old months packed into uncompressed ZIP bundles under
+# db_files/archive. Rows keep their paths; this index says where each archived
+# file's bytes start in its bundle. source_removed is 0 until the loose copy is deleted.
+ARCHIVE_SCHEMA = (
+    '''
+    CREATE TABLE IF NOT EXISTS archive_members (
+        path TEXT PRIMARY KEY,
+        archive TEXT NOT NULL,
+        data_offset INTEGER NOT NULL,
+        size INTEGER NOT NULL,
+        crc32 INTEGER NOT NULL,
+        source_removed INTEGER NOT NULL DEFAULT 0
+    );
+    ''',
+    "CREATE INDEX IF NOT EXISTS idx_archive_members_archive ON archive_members(archive);",
+    "CREATE INDEX IF NOT EXISTS idx_archive_members_pending ON archive_members(source_removed);",
+)
+# Lock database in db_files/archive; an exclusive transaction on it is held while archiving
+ARCHIVE_LOCK_NAME = "archive.lock"
+
+def record_file_base(patient_id, procedure_date, doctor, record_id):
+    """Readable file name (without extension) of a record's audio and PDF."""
+    return f"{patient_id}_{procedure_date.replace('/', '-')}_{doctor.replace(' ', '_')}_{record_id}"
+
+def storage_subdir(layout, file_name, procedure_date=""):
+    """Sub-folder (relative, possibly "") a stored file belongs in under the given layout."""
+    if layout == "flat":
+        return ""
+    if layout == "content":
+        # file_name is already "<sha256><ext>"
+        return os.path.join(file_name[:2], file_name[2:4])
+    if layout == "hash":
+        digest = hashlib.sha1(file_name.encode("utf-8")).hexdigest()
+        return os.path.join(digest[:2], digest[2:4])
+    if layout == "date":
+        iso = iso_date(procedure_date)
+        return os.path.join(iso[:4], iso[5:7]) if iso else "unknown"
+    raise ValueError(f"Unknown storage layout: {layout}")
+
+def configure_connection(conn, pragmas=CONNECTION_PRAGMAS):
+    """Apply pragmas (CONNECTION_PRAGMAS by default) to a freshly opened connection."""
+    for pragma in pragmas:
+        conn.execute(pragma)
+    return conn
+
+class ConnectionManager:
+    """
+    Hands out connections to one database file: a read-write connection per thread,
+    opened on first use, and a pool of read-only connections for searches.
+
+    With WAL, searches on pooled readers run alongside a batch being written on
+    another thread's connection, and no connection or cursor is shared by two threads.
+    """
+
+    def __init__(self, db_path, read_pool_size=READ_POOL_SIZE):
+        self.db_path = db_path
+        self._local = threading.local()
+        self._readers = queue.LifoQueue(maxsize=read_pool_size)
+        self._opened = []
+        self._close_callbacks = []
+        self._lock = threading.Lock()
+
+    def _track(self, conn):
+        with self._lock:
+            self._opened.append(conn)
+        return conn
+
+    def connection(self):
+        """The calling thread's read-write connection."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            # check_same_thread=False only so close() may run on another thread
+            conn = sqlite3.connect(self.db_path, timeout=BUSY_TIMEOUT, check_same_thread=False)
+            self._local.conn = self._track(configure_connection(conn))
+        return conn
+
+    @contextmanager
+    def reader(self):
+        """Borrow a read-only connection from the pool (opened if none is idle)."""
+        try:
+            conn = self._readers.get_nowait()
+        except queue.Empty:
+            conn = self.open_reader()
+        try:
+            yield conn
+        finally:
+            try:
+                self._readers.put_nowait(conn)
+            except queue.Full:
+                self._forget(conn)
+
+    def open_reader(self):
+        """Open a read-only connection outside the pool (closed by close())."""
+        from urllib.request import pathname2url  # Pulls in http.client and email: only load it when needed
+        uri = f"file:{pathname2url(os.path.abspath(self.db_path))}?mode=ro"
+        conn = sqlite3.connect(uri, uri=True, timeout=BUSY_TIMEOUT, check_same_thread=False)
+        return self._track(configure_connection(conn, READER_PRAGMAS))
+
+    def _forget(self, conn):
+        with self._lock:
+            if conn in self._opened:
+                self._opened.remove(conn)
+        conn.close()
+
+    def release(self):
+        """
+        Close the calling thread's read-write connection, if it opened one (an open
+        transaction is rolled back). Threads that come and go call this before they
+        end; the thread's next use opens a new connection.
+        """
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            self._local.conn = None
+            self._forget(conn)
+
+    def on_close(self, callback):
+        """Call callback() after every close(), to drop state tied to the closed connections."""
+        with self._lock:
+            self._close_callbacks.append(callback)
+
+    def close(self):
+        """Close every connection handed out so far."""
+        with self._lock:
+            opened, self._opened = self._opened, []
+            callbacks = list(self._close_callbacks)
+        for conn in opened:
+            conn.close()
+        self._local = threading.local()
+        self._readers = queue.LifoQueue(maxsize=self._readers.maxsize)
+        for callback in callbacks:
+            callback()
+
+class SearchCache:
+    """
+    LRU cache of search query rows for one database, keyed by (sql, params), holding
+    at most max_rows rows in total (an empty result counts as one).
+
+    Instead of a TTL, every lookup reads PRAGMA data_version on a connection of its
+    own: the value changes whenever any other connection (in this process or not)
+    commits, and the cache is then emptied, so results are never stale. Closing the
+    manager empties the cache too; the next lookup opens a new connection.
+    """
+
+    def __init__(self, manager, max_rows=SEARCH_CACHE_ROWS):
+        self.max_rows = max_rows
+        self._manager = manager
+        self._conn = None
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()
+        self._rows = 0
+        self._version = None
+        self.hits = 0
+        self.misses = 0
+        manager.on_close(self.clear)
+
+    def clear(self):
+        """Forget every entry and the version connection (closed by the manager)."""
+        with self._lock:
+            self._entries.clear()
+            self._rows = 0
+            self._version = None
+            self._conn = None
+
+    def lookup(self, key):
+        """Return (rows or None, version); pass version back to store()."""
+        with self._lock:
+            if self._conn is None:
+                self._conn = self._manager.open_reader()
+            version = self._conn.execute("PRAGMA data_version;").fetchone()[0]
+            if version != self._version:
+                self._entries.clear()
+                self._rows = 0
+                self._version = version
+            rows = self._entries.get(key)
+            if rows is None:
+                self.misses += 1
+                return None, version
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return rows, version
+
+    def store(self, key, rows, version):
+        """Keep rows read after lookup() returned version, unless the data changed since."""
+        size = max(len(rows), 1)
+        with self._lock:
+            if version != self._version or size > self.max_rows:
+                return
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._rows -= max(len(previous), 1)
+            self._entries[key] = rows
+            self._rows += size
+            while self._rows > self.max_rows:
+                _, evicted = self._entries.popitem(last=False)
+                self._rows -= max(len(evicted), 1)
+
+    def stats(self):
+        total = self.hits + self.misses
+        return {"hits": self.hits, "misses": self.misses, "hit_rate": self.hits / total if total else 0.0}
+
+_managers = {}
+_search_caches = {}
+_managers_lock = threading.Lock()
+
+def get_connection_manager(db_path):
+    """The shared ConnectionManager used by the search functions for db_path."""
+    key = os.path.abspath(db_path)
+    with _managers_lock:
+        manager = _managers.get(key)
+        if manager is None:
+            manager = _managers[key] = ConnectionManager(db_path)
+        return manager
+
+def get_search_cache(db_path):
+    """The shared SearchCache in front of the search functions for db_path."""
+    manager = get_connection_manager(db_path)
+    key = os.path.abspath(db_path)
+    with _managers_lock:
+        cache = _search_caches.get(key)
+        if cache is None:
+            cache = _search_caches[key] = SearchCache(manager)
+        return cache
+
+def search_cache_stats(db_path):
+    """Hit/miss counters of the search cache for db_path."""
+    return get_search_cache(db_path).stats()
+
+def copy_stored_file(db_path, path, dest_path):
+    """
+    Copy a record's stored file to dest_path: from db_files, or once archived, by
+    seeking straight to its bytes in the month's bundle.
+    """
+    if os.path.exists(path):
+        return shutil.copy2(path, dest_path)
+    with get_connection_manager(db_path).reader() as conn:
+        member = conn.execute(
+            "SELECT archive, data_offset, size, crc32 FROM archive_members WHERE path = ?;", (path,)
+        ).fetchone()
+    if member is None:
+        raise FileNotFoundError(f"Stored file not found: {path}")
+    return copy_member(*member, dest_path)
+
+class SearchCancelled(Exception):
+    """Raised by a search whose CancelToken was cancelled."""
+
+class CancelToken:
+    """
+    Lets another thread abort a search: cancel() interrupts the query running on
+    the token's reader connection (sqlite3.Connection.interrupt), and any later
+    query of the same search fails before it starts.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._conn = None
+        self.cancelled = False
+
+    def cancel(self):
+        with self._lock:
+            self.cancelled = True
+            if self._conn is not None:
+                self._conn.interrupt()
+
+    @contextmanager
+    def running_on(self, conn):
+        """Attach conn while a query runs, so cancel() only ever interrupts this search."""
+        with self._lock:
+            if self.cancelled:
+                raise SearchCancelled()
+            self._conn = conn
+        try:
+            yield
+        except sqlite3.OperationalError as e:
+            if self.cancelled and "interrupted" in str(e):
+                raise SearchCancelled() from e
+            raise
+        finally:
+            with self._lock:
+                self._conn = None
+
+def _fetch_search_rows(db_path, query, values, cancel=None):
+    """Run a search query on a pooled reader, through the search cache; see CancelToken."""
+    cache = get_search_cache(db_path)
+    key = (query, tuple(values))
+    rows, version = cache.lookup(key)
+    if rows is None:
+        with get_connection_manager(db_path).reader() as conn:
+            if cancel is None:
+                rows = conn.execute(query, values).fetchall()
+            else:
+                with cancel.running_on(conn):
+                    rows = conn.execute(query, values).fetchall()
+        cache.store(key, rows, version)
+    return rows
 
 class MedicalReportDB:
-    def __init__(self, db_path='medical_reports.db'):
+    def __init__(self, db_path='medical_reports.db', storage_layout="flat"):
+        if storage_layout not in STORAGE_LAYOUTS:
+            raise ValueError(f"Unknown storage layout: {storage_layout}")
         self.db_path = db_path
+        self.storage_layout = storage_layout
         self.base_folder = os.path.join(os.path.dirname(os.path.abspath(db_path)), 'db_files')
         self.audio_folder = os.path.join(self.base_folder, 'audios')
         self.pdf_folder = os.path.join(self.base_folder, 'pdfs')
+        self.archive_folder = os.path.join(self.base_folder, 'archive')
         os.makedirs(self.audio_folder, exist_ok=True)
         os.makedirs(self.pdf_folder, exist_ok=True)
-        self.conn = sqlite3.connect(self.db_path, check_same_thread=False)
-        self.cursor = self.conn.cursor()
+        os.makedirs(self.archive_folder, exist_ok=True)
+        self._archive_lock = threading.Lock()
+        # Each thread writes on its own connection; searches use pooled readers
+        self._connections = ConnectionManager(self.db_path)
+        # The ingest pipeline reserves IDs and writes rows from different threads
+        self._lock = threading.RLock()
+        self._reserved_ids = iter(())     # Rest of the last block from _reserve_ids()
         self._create_tables()
 
+    @property
+    def conn(self):
+        """The calling thread's connection; commit()/rollback() act on it too."""
+        return self._connections.connection()
+
     def _create_tables(self):
-        self.cursor.execute('''
+        cursor = self.conn.cursor()
+        cursor.execute('''
             CREATE TABLE IF NOT EXISTS medical_reports (
                 id INTEGER PRIMARY KEY AUTOINCREMENT,
                 patient_id TEXT NOT NULL CHECK(length(patient_id) <= 20),
@@ -30,117 +558,712 @@ class MedicalReportDB:
                 audio_file_path TEXT NOT NULL,
                 pdf_file_path TEXT NOT NULL,
                 ambulatorio INTEGER NOT NULL,
-                multiple_audios INTEGER NOT NULL
+                multiple_audios INTEGER NOT NULL,
+                report_text TEXT NOT NULL DEFAULT '',
+                patient_name_norm TEXT NOT NULL DEFAULT '',
+                procedure_date_iso TEXT NOT NULL DEFAULT '',
+                transcription_date_iso TEXT NOT NULL DEFAULT ''
             );
         ''')
-        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_patient_id ON medical_reports(patient_id);")
-        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_patient_name ON medical_reports(patient_name);")
-        self.cursor.execute("CREATE INDEX IF NOT EXISTS idx_transcription_date ON medical_reports(transcription_date);")
+        # Databases created before report bodies and shadow columns were stored
+        columns = {row[1] for row in cursor.execute("PRAGMA table_info(medical_reports);")}
+        if "report_text" not in columns:
+            cursor.execute("ALTER TABLE medical_reports ADD COLUMN report_text TEXT NOT NULL DEFAULT '';")
+        missing_shadows = [column for column in SHADOW_COLUMNS if column not in columns]
+        for column in missing_shadows:
+            cursor.execute(f"ALTER TABLE medical_reports ADD COLUMN {column} TEXT NOT NULL DEFAULT '';")
+        if missing_shadows:
+            # One-time backfill of the new shadow columns
+            rows = cursor.execute(
+                "SELECT id, patient_name, procedure_date, transcription_date FROM medical_reports;"
+            ).fetchall()
+            cursor.executemany(
+                f"UPDATE medical_reports SET {', '.join(f'{column} = ?' for column in SHADOW_COLUMNS)} WHERE id = ?;",
+                [
+                    shadow_values({"patient_name": name, "procedure_date": procedure, "transcription_date": transcription})
+                    + (row_id,)
+                    for row_id, name, procedure, transcription in rows
+                ]
+            )
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_patient_id ON medical_reports(patient_id);")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_patient_name ON medical_reports(patient_name);")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_patient_name_norm ON medical_reports(patient_name_norm);")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_transcription_date ON medical_reports(transcription_date);")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_procedure_date_iso ON medical_reports(procedure_date_iso);")
+        cursor.execute("CREATE INDEX IF NOT EXISTS idx_transcription_date_iso ON medical_reports(transcription_date_iso);")
+
+        stored_files_exists = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'stored_files';"
+        ).fetchone() is not None
+        for statement in STORED_FILES_SCHEMA:
+            cursor.execute(statement)
+        if not stored_files_exists:
+            cursor.execute('''
+                INSERT INTO stored_files(path, refcount)
+                SELECT path, COUNT(*) FROM (
+                    SELECT audio_file_path AS path FROM medical_reports
+                    UNION ALL SELECT pdf_file_path FROM medical_reports
+                ) GROUP BY path;
+            ''')
+
+        for statement in ARCHIVE_SCHEMA:
+            cursor.execute(statement)
+
+        fts_exists = cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE name = 'medical_reports_fts';"
+        ).fetchone() is not None
+        for statement in FTS_SCHEMA:
+            cursor.execute(statement)
+        if not fts_exists:
+            # Index the rows that were stored before the full-text table existed
+            cursor.execute("INSERT INTO medical_reports_fts(medical_reports_fts) VALUES ('rebuild');")
         self.conn.commit()
 
     def insert_record(self, patient_id, patient_name, medical_procedure, procedure_date,
-                      transcriptor, transcription_date, doctor, audio_src_path, pdf_src_path):
+                      transcriptor, transcription_date, doctor, audio_src_path, pdf_src_path, report_text=""):
         """Insert a record into the database and store files in db_files folder."""
+        record = None
         try:
-            self.cursor.execute("SELECT seq FROM sqlite_sequence WHERE name='medical_reports';")
-            last_id = self.cursor.fetchone()
-            new_id = last_id[0] + 1 if last_id else 1
-
-            # Build the file base name.
-            # Note: We assume that if the file has been processed previously (by process_matched_files)
-            # it will contain the keywords if applicable.
-            file_base = f"{patient_id}_{procedure_date.replace('/', '-')}_{doctor.replace(' ', '_')}_{new_id}"
-            audio_file_name = file_base + ".mp3"
-            pdf_file_name = file_base + ".pdf"
-
-            # Determine booleans by checking for keywords in the file names.
-            ambulatorio_flag = 1 if ("AMBULATORIO" in audio_file_name or "AMBULATORIO" in pdf_file_name) else 0
-            multiple_audios_flag = 1 if ("MULTIPLES_AUDIOS" in audio_file_name or "MULTIPLES_AUDIOS" in pdf_file_name) else 0
-
-            audio_file_path = self._store_file(audio_src_path, self.audio_folder, audio_file_name)
-            pdf_file_path = self._store_file(pdf_src_path, self.pdf_folder, pdf_file_name)
-
-            self.cursor.execute('''
-                INSERT INTO medical_reports (
-                    patient_id, patient_name, medical_procedure, procedure_date,
-                    transcriptor, transcription_date, doctor, audio_file_path, pdf_file_path,
-                    ambulatorio, multiple_audios
-                ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (patient_id, patient_name, medical_procedure, procedure_date,
-                  transcriptor, transcription_date, doctor, audio_file_path, pdf_file_path,
-                  ambulatorio_flag, multiple_audios_flag))
-            self.conn.commit()
+            record = self.prepare_record(patient_id, patient_name, medical_procedure, procedure_date,
+                                         transcriptor, transcription_date, doctor, audio_src_path, pdf_src_path,
+                                         report_text)
+            self.write_record(record)
             print(f"Record inserted successfully for patient: {patient_name}.")
         except Exception as e:
             print(f"Failed to insert record for patient {patient_name}: {e}")
             # If storing failed, ensure files remain in original folder
-            if os.path.exists(audio_file_path):
-                os.remove(audio_file_path)
-            if os.path.exists(pdf_file_path):
-                os.remove(pdf_file_path)
+            if record is not None:
+                self.unstore_record(record)
+
+    def _reserve_id(self):
+        """
+        Hand out the next record ID from the block reserved last, reserving a new
+        block of ID_BLOCK_SIZE when it runs out. Inside an open transaction only
+        this one ID is reserved, in that transaction, since a rollback would
+        give the rest of a block back.
+        """
+        with self._lock:
+            new_id = next(self._reserved_ids, None)
+            if new_id is not None:
+                return new_id
+            if self.conn.in_transaction:
+                return self._reserve_ids(1)[0]
+            self._reserved_ids = iter(self._reserve_ids(ID_BLOCK_SIZE))
+            return next(self._reserved_ids)
+
+    def _reserve_ids(self, count):
+        """
+        Reserve count consecutive record IDs and return them as a range. sqlite_sequence
+        moves forward by count in one write transaction (BEGIN IMMEDIATE, or the
+        caller's if one is open), so IDs stay unique while their rows are still
+        unwritten, also across other connections and processes writing to the same
+        database.
+        """
+        with self._lock:
+            conn = self.conn
+            own_transaction = not conn.in_transaction
+            if own_transaction:
+                conn.execute("BEGIN IMMEDIATE;")
+            try:
+                row = conn.execute("SELECT seq FROM sqlite_sequence WHERE name = 'medical_reports';").fetchone()
+                first_id = (row[0] if row else 0) + 1
+                last_id = first_id + count - 1
+                if row:
+                    conn.execute("UPDATE sqlite_sequence SET seq = ? WHERE name = 'medical_reports';", (last_id,))
+                else:
+                    conn.execute("INSERT INTO sqlite_sequence(name, seq) VALUES ('medical_reports', ?);", (last_id,))
+            except Exception:
+                if own_transaction:
+                    conn.rollback()
+                raise
+            if own_transaction:
+                conn.commit()
+            return range(first_id, last_id + 1)
+
+    def prepare_record(self, patient_id, patient_name, medical_procedure, procedure_date,
+                       transcriptor, transcription_date, doctor, audio_src_path, pdf_src_path, report_text=""):
+        """
+        Reserve an ID for the record and move its files into db_files.
+        Returns the row to pass to write_record().
+        """
+        record = self.plan_record(patient_id, patient_name, medical_procedure, procedure_date,
+                                  transcriptor, transcription_date, doctor, audio_src_path, pdf_src_path,
+                                  report_text)
+        self.store_record(record)
+        return record
+
+    def plan_record(self, patient_id, patient_name, medical_procedure, procedure_date,
+                    transcriptor, transcription_date, doctor, audio_src_path, pdf_src_path, report_text=""):
+        """
+        Reserve an ID for the record and decide where its files go, without moving them.
+        With the "content" layout this hashes both source files.
+        """
+        new_id = self._reserve_id()
+
+        # Build the file base name.
+        # Note: We assume that if the file has been processed previously (by process_matched_files)
+        # it will contain the keywords if applicable.
+        file_base = record_file_base(patient_id, procedure_date, doctor, new_id)
+        audio_file_name = file_base + ".mp3"
+        pdf_file_name = file_base + ".pdf"
+
+        # Determine booleans by checking for keywords in the file names.
+        ambulatorio_flag = 1 if ("AMBULATORIO" in audio_file_name or "AMBULATORIO" in pdf_file_name) else 0
+        multiple_audios_flag = 1 if ("MULTIPLES_AUDIOS" in audio_file_name or "MULTIPLES_AUDIOS" in pdf_file_name) else 0
+
+        record = {
+            "id": new_id,
+            "patient_id": patient_id,
+            "patient_name": patient_name,
+            "medical_procedure": medical_procedure,
+            "procedure_date": procedure_date,
+            "transcriptor": transcriptor,
+            "transcription_date": transcription_date,
+            "doctor": doctor,
+            "audio_file_path": self._target_path(self.audio_folder, audio_src_path, audio_file_name, procedure_date),
+            "pdf_file_path": self._target_path(self.pdf_folder, pdf_src_path, pdf_file_name, procedure_date),
+            "ambulatorio": ambulatorio_flag,
+            "multiple_audios": multiple_audios_flag,
+            "report_text": report_text,
+            "audio_src_path": audio_src_path,
+            "pdf_src_path": pdf_src_path,
+        }
+        return record
+
+    def storage_path(self, folder, file_name, procedure_date=""):
+        """Where a file named file_name is kept under folder with the current storage layout."""
+        return os.path.join(folder, storage_subdir(self.storage_layout, file_name, procedure_date), file_name)
 
-    def _store_file(self, src_path, dest_folder, file_name):
+    def _target_path(self, folder, src_path, file_name, procedure_date=""):
+        """Where the file at src_path, stored as file_name, goes with the current layout."""
+        if self.storage_layout == "content":
+            file_name = file_sha256(src_path) + os.path.splitext(file_name)[1]
+        return self.storage_path(folder, file_name, procedure_date)
+
+    def is_blob(self, path):
+        """Whether path is a content-addressed file, possibly shared by several records."""
+        name = os.path.basename(path)
+        if not BLOB_NAME.fullmatch(os.path.splitext(name)[0]):
+            return False
+        folder = os.path.dirname(os.path.dirname(os.path.dirname(path)))
+        return path == os.path.join(folder, storage_subdir("content", name), name)
+
+    def file_refcount(self, path):
+        """Number of records pointing to a stored path (committed or on this thread's connection)."""
+        row = self.conn.execute("SELECT refcount FROM stored_files WHERE path = ?;", (path,)).fetchone()
+        return row[0] if row else 0
+
+    def store_record(self, record):
+        """Move a planned record's files into db_files; on failure both stay in their source folder."""
+        try:
+            self._store_file(record["audio_src_path"], record["audio_file_path"])
+            self._store_file(record["pdf_src_path"], record["pdf_file_path"])
+        except Exception:
+            self.unstore_record(record)
+            raise
+
+    def write_record(self, record, commit=True):
+        """Insert a row built by prepare_record(). Pass commit=False to batch several rows."""
+        self.insert_records([record], commit=commit)
+
+    def insert_records(self, records, commit=True):
+        """
+        Insert many rows built by prepare_record() with a single executemany.
+        IDs were already reserved by prepare_record(), so no sqlite_sequence lookup
+        happens here. With commit=True all rows go in one transaction; on error
+        nothing is inserted.
+        """
+        rows = [tuple(record[column] for column in RECORD_COLUMNS) + shadow_values(record) for record in records]
+        held = [(record[key],) for record in records for key in ("audio_file_path", "pdf_file_path")
+                if self.is_blob(record[key])]
+        conn = self.conn
+        try:
+            conn.executemany(INSERT_RECORD_SQL, rows)
+            if held:
+                conn.executemany("UPDATE pending_blobs SET holds = holds - 1 WHERE path = ?;", held)
+                conn.execute("DELETE FROM pending_blobs WHERE holds <= 0;")
+        except Exception:
+            if commit:
+                conn.rollback()
+            raise
+        if commit:
+            conn.commit()
+
+    def commit(self):
+        self.conn.commit()
+
+    def rollback(self):
+        self.conn.rollback()
+
+    @contextmanager
+    def savepoint(self, name="record"):
+        """
+        Run the block inside a savepoint of this thread's transaction (begun if
+        none is open): on error only the block's statements are rolled back and
+        the exception propagates; nothing is committed here.
+        """
+        conn = self.conn
+        if not conn.in_transaction:
+            conn.execute("BEGIN;")
+        conn.execute(f"SAVEPOINT {name};")
+        try:
+            yield conn
+        except Exception:
+            conn.execute(f"ROLLBACK TO {name};")
+            conn.execute(f"RELEASE {name};")
+            raise
+        conn.execute(f"RELEASE {name};")
+
+    def unstore_record(self, record):
+        """Move a record's stored files back to where they came from."""
+        for stored_key, src_key in (("audio_file_path", "audio_src_path"), ("pdf_file_path", "pdf_src_path")):
+            stored_path = record.get(stored_key)
+            if not stored_path or not os.path.exists(stored_path):
+                continue
+            if not self.is_blob(stored_path):
+                shutil.move(stored_path, record[src_key])
+                continue
+            with self._lock:
+                if not self._release_blob(stored_path):
+                    # Other records (stored or in flight) share it: put a copy back instead.
+                    # The group is retried later and finds its content already stored.
+                    if not os.path.exists(record[src_key]):
+                        shutil.copy2(stored_path, record[src_key])
+                elif os.path.exists(record[src_key]):
+                    os.remove(stored_path)
+                else:
+                    shutil.move(stored_path, record[src_key])
+
+    def _hold_blob(self, path):
+        """Count one more stored, not yet inserted record holding the blob at path."""
+        conn = self.conn
+        own_transaction = not conn.in_transaction
+        conn.execute(
+            "INSERT INTO pending_blobs(path, holds) VALUES (?, 1) "
+            "ON CONFLICT(path) DO UPDATE SET holds = holds + 1;", (path,)
+        )
+        if own_transaction:
+            conn.commit()
+
+    def _release_blob(self, path):
+        """Drop one hold on the blob at path; return whether no row or hold references it any more."""
+        conn = self.conn
+        own_transaction = not conn.in_transaction
+        if own_transaction:
+            conn.execute("BEGIN IMMEDIATE;")
+        try:
+            conn.execute("UPDATE pending_blobs SET holds = holds - 1 WHERE path = ? AND holds > 0;", (path,))
+            conn.execute("DELETE FROM pending_blobs WHERE path = ? AND holds <= 0;", (path,))
+            held = conn.execute("SELECT 1 FROM pending_blobs WHERE path = ?;", (path,)).fetchone() is not None
+            unused = not held and self.file_refcount(path) == 0
+        except Exception:
+            if own_transaction:
+                conn.rollback()
+            raise
+        if own_transaction:
+            conn.commit()
+        return unused
+
+    def _store_file(self, src_path, dest_path):
         """Store the file in db_files structure and remove from original folder."""
-        dest_path = os.path.join(dest_folder, file_name)
-        shutil.move(src_path, dest_path)
+        with self._lock:
+            blob = self.is_blob(dest_path)
+            if blob and os.path.exists(dest_path):
+                # A blob is named after the SHA-256 of its content (and so of src_path's)
+                if file_sha256(dest_path) == os.path.splitext(os.path.basename(dest_path))[0]:
+                    os.remove(src_path)
+                    self._hold_blob(dest_path)
+                    return dest_path
+                # A damaged copy; replace it with this one
+                os.remove(dest_path)
+            os.makedirs(os.path.dirname(dest_path), exist_ok=True)
+            shutil.move(src_path, dest_path)
+            if blob:
+                self._hold_blob(dest_path)
         return dest_path
 
-    def search_records(self, **kwargs):
-        """Search records based on provided fields."""
-        conditions = []
-        values = []
-        for field, value in kwargs.items():
-            conditions.append(f"{field} LIKE ?")
-            values.append(f"%{value}%")
+    def migrate_storage(self, batch_size=STORAGE_MIGRATION_BATCH, stop_event=None):
+        """
+        Move stored files that are not where the current storage layout puts them,
+        updating their paths in medical_reports one batch (and transaction) at a time.
+        Safe to interrupt and rerun: a file already at its new place only gets its
+        path updated. Moving to the "content" layout links (or copies) each file to
+        its blob first and deletes the original only after the batch is committed.
+        Content-addressed files are never moved out, as records may share them.
+        Returns the number of files moved.
+        """
+        moved = 0
+        last_id = 0
+        conn = self.conn
+        while stop_event is None or not stop_event.is_set():
+            rows = conn.execute(
+                "SELECT id, audio_file_path, pdf_file_path, procedure_date, "
+                "audio_file_path IN (SELECT path FROM archive_members), "
+                "pdf_file_path IN (SELECT path FROM archive_members) "
+                "FROM medical_reports WHERE id > ? ORDER BY id LIMIT ?;", (last_id, batch_size)
+            ).fetchall()
+            if not rows:
+                break
+            last_id = rows[-1][0]
+            updates = []
+            superseded = []
+            for row_id, audio_path, pdf_path, procedure_date, audio_archived, pdf_archived in rows:
+                new_paths = []
+                for path, folder, archived in ((audio_path, self.audio_folder, audio_archived),
+                                               (pdf_path, self.pdf_folder, pdf_archived)):
+                    # Only loose files inside this database's storage folders are moved
+                    if archived or self.is_blob(path) or not os.path.abspath(path).startswith(folder + os.sep):
+                        new_paths.append(path)
+                        continue
+                    if self.storage_layout == "content":
+                        if os.path.exists(path):
+                            target = self._target_path(folder, path, os.path.basename(path))
+                            self._link_blob(path, target)
+                            superseded.append(path)
+                            moved += 1
+                            new_paths.append(target)
+                        else:
+                            print(f"Storage migration: missing file {path}")
+                            new_paths.append(path)
+                        continue
+                    target = self.storage_path(folder, os.path.basename(path), procedure_date)
+                    if path == target:
+                        new_paths.append(path)
+                    elif os.path.exists(path):
+                        self._store_file(path, target)
+                        moved += 1
+                        new_paths.append(target)
+                    elif os.path.exists(target):
+                        # Moved by an interrupted run before its batch was committed
+                        new_paths.append(target)
+                    else:
+                        print(f"Storage migration: missing file {path}")
+                        new_paths.append(path)
+                if new_paths != [audio_path, pdf_path]:
+                    updates.append((new_paths[0], new_paths[1], row_id))
+            if updates:
+                conn.executemany(
+                    "UPDATE medical_reports SET audio_file_path = ?, pdf_file_path = ? WHERE id = ?;", updates
+                )
+                conn.commit()
+            for path in superseded:
+                if os.path.exists(path):
+                    os.remove(path)
+        return moved
+
+    def _link_blob(self, src_path, blob_path):
+        """Make blob_path hold src_path's content, keeping src_path in place."""
+        with self._lock:
+            if os.path.exists(blob_path):
+                return
+            os.makedirs(os.path.dirname(blob_path), exist_ok=True)
+            try:
+                os.link(src_path, blob_path)
+            except OSError:
+                # No hard links on this file system (e.g. some network shares)
+                shutil.copy2(src_path, blob_path)
+
+    def archive_cold_months(self, keep_months, stop_event=None):
+        """
+        Archive every month (by procedure date) older than the last keep_months,
+        counting the current one. Returns the number of files archived.
+        """
+        today = date.today()
+        first_kept = today.year * 12 + today.month - 1 - (keep_months - 1)
+        cutoff = f"{first_kept // 12:04d}-{first_kept % 12 + 1:02d}-01"
+        months = [row[0] for row in self.conn.execute(
+            "SELECT DISTINCT substr(procedure_date_iso, 1, 7) FROM medical_reports "
+            "WHERE procedure_date_iso != '' AND procedure_date_iso < ? ORDER BY 1;", (cutoff,)
+        )]
+        archived = 0
+        for month in months:
+            if stop_event is not None and stop_event.is_set():
+                break
+            archived += self.archive_month(month)
+        return archived
+
+    def archive_month(self, month):
+        """
+        Pack the loose stored files of one month ("YYYY-MM", by procedure date) into a
+        new bundle, verify it, index it and only then delete the loose files.
+        Interrupted runs are finished or cleaned up first. Returns the number archived;
+        0 while another process (e.g. file_handler.py --watch next to the app) is archiving.
+        """
+        year, month_number = (int(part) for part in month.split("-"))
+        next_month = f"{year + month_number // 12:04d}-{month_number % 12 + 1:02d}"
+        conn = self.conn
+        with self._archive_lock, self._archive_process_lock() as locked:
+            if not locked:
+                print(f"Skipped archiving {month}: another process is archiving.")
+                return 0
+            self._resume_archiving()
+            paths = [row[0] for row in conn.execute(
+                '''
+                SELECT path FROM (
+                    SELECT audio_file_path AS path FROM medical_reports
+                    WHERE procedure_date_iso >= ? AND procedure_date_iso < ?
+                    UNION SELECT pdf_file_path FROM medical_reports
+                    WHERE procedure_date_iso >= ? AND procedure_date_iso < ?
+                ) WHERE path NOT IN (SELECT path FROM archive_members) ORDER BY path;
+                ''', (f"{month}-01", f"{next_month}-01") * 2
+            )]
+            # Files kept outside db_files, or already gone, are left alone
+            paths = [path for path in paths
+                     if os.path.abspath(path).startswith(self.base_folder + os.sep) and os.path.exists(path)]
+            if not paths:
+                return 0
+
+            number = 1
+            while os.path.exists(os.path.join(self.archive_folder, f"{month}.{number}.zip")):
+                number += 1
+            bundle_path = os.path.join(self.archive_folder, f"{month}.{number}.zip")
+            part_path = bundle_path + ".part"
+            arcnames = {os.path.relpath(path, self.base_folder).replace(os.sep, "/"): path for path in paths}
+            index = write_bundle(part_path, list(arcnames.items()))
+            for _, data_offset, size, crc32 in index:
+                copy_member(part_path, data_offset, size, crc32)
+            os.replace(part_path, bundle_path)
+
+            conn.executemany(
+                "INSERT INTO archive_members (path, archive, data_offset, size, crc32) VALUES (?, ?, ?, ?, ?);",
+                [(arcnames[arcname], bundle_path, data_offset, size, crc32)
+                 for arcname, data_offset, size, crc32 in index]
+            )
+            conn.commit()
+            self._remove_archived_sources()
+            print(f"Archived {len(paths)} files of {month} into {os.path.basename(bundle_path)}.")
+            return len(paths)
+
+    @contextmanager
+    def _archive_process_lock(self):
+        """
+        Yield whether this process now holds the archive lock, shared by every process
+        using this db_files folder. It is an exclusive transaction on ARCHIVE_LOCK_NAME,
+        so the operating system releases it if the process dies mid-archive.
+        """
+        lock = sqlite3.connect(os.path.join(self.archive_folder, ARCHIVE_LOCK_NAME), timeout=0, isolation_level=None)
+        try:
+            try:
+                lock.execute("BEGIN EXCLUSIVE;")
+            except sqlite3.OperationalError:
+                yield False
+            else:
+                yield True
+        finally:
+            lock.close()
+
+    def _resume_archiving(self):
+        """Finish or roll back an interrupted archive_month(); call with the archive lock held."""
+        # Bundles written but never indexed (and unfinished .part files) are discarded:
+        # their files are still loose and get archived again
+        indexed = {row[0] for row in self.conn.execute("SELECT DISTINCT archive FROM archive_members;")}
+        for name in os.listdir(self.archive_folder):
+            path = os.path.join(self.archive_folder, name)
+            if name.endswith(".part") or (name.endswith(".zip") and path not in indexed):
+                os.remove(path)
+        self._remove_archived_sources()
+
+    def _remove_archived_sources(self):
+        """Delete the loose copies of indexed members."""
+        conn = self.conn
+        pending = [row[0] for row in conn.execute("SELECT path FROM archive_members WHERE source_removed = 0;")]
+        for path in pending:
+            if os.path.exists(path):
+                os.remove(path)
+        conn.executemany("UPDATE archive_members SET source_removed = 1 WHERE path = ?;", [(path,) for path in pending])
+        conn.commit()
+
+    def verify_archives(self):
+        """Read every archived file back and check its CRC-32. Returns [(path, error)] for the bad ones."""
+        problems = []
+        for path, bundle_path, data_offset, size, crc32 in self.conn.execute(
+                "SELECT path, archive, data_offset, size, crc32 FROM archive_members ORDER BY archive, data_offset;"
+        ).fetchall():
+            try:
+                copy_member(bundle_path, data_offset, size, crc32)
+            except (ArchiveError, OSError) as e:
+                problems.append((path, str(e)))
+        return problems
+
+    def search_records(self, match="contains", **kwargs):
+        """Search records based on provided fields, compared per match (see MATCH_MODES)."""
+        conditions, values = _search_filters(kwargs, match)
 
         query = "SELECT * FROM medical_reports"
         if conditions:
             query += " WHERE " + " AND ".join(conditions)
 
-        self.cursor.execute(query, values)
-        return self.cursor.fetchall()
+        with self._connections.reader() as conn:
+            return conn.execute(query, values).fetchall()
+
+    def release(self):
+        """Close the calling thread's connection; see ConnectionManager.release()."""
+        self._connections.release()
 
     def close(self):
-        """Close the database connection."""
-        self.conn.close()
+        """Close the database connections."""
+        self._connections.close()
+
 
+# Fields date_from/date_to can filter on, and the ISO column answering the range
+DATE_RANGE_COLUMNS = {
+    "transcription_date": "transcription_date_iso",
+    "procedure_date": "procedure_date_iso",
+}
 
-def search_database(db_path, patient_id=None, patient_name=None, transcription_date=None):
+def _search_source(patient_id=None, patient_name=None, transcription_date=None, text=None,
+                   match="contains", date_from=None, date_to=None, date_field="transcription_date"):
     """
-    Search the medical_reports database based on patient_id, patient_name, or transcription_date.
-    Returns a dictionary containing the results of the search.
+    Return (columns_sql, from_sql, conditions, values, fts_match, date_column) shared
+    by the search queries; medical_reports is aliased m.
     """
-    conn = sqlite3.connect(db_path)
-    cursor = conn.cursor()
-
-    # Build dynamic query based on provided inputs
     conditions = []
     values = []
 
-    if patient_id:
-        conditions.append("patient_id LIKE ?")
-        values.append(f"%{patient_id}%")
+    fts_match = fts_query(text) if text else ""
+    if fts_match:
+        conditions.append("medical_reports_fts MATCH ?")
+        values.append(fts_match)
+
+    filters = {"patient_id": patient_id, "patient_name": patient_name, "transcription_date": transcription_date}
+    filter_conditions, filter_values = _search_filters(filters, match, alias="m.")
+    conditions += filter_conditions
+    values += filter_values
+
+    date_column = None
+    if date_from or date_to:
+        # Both bounds are always set so rows without a valid date ("") stay out
+        date_column = "m." + DATE_RANGE_COLUMNS[date_field]
+        conditions.append(f"{date_column} BETWEEN ? AND ?")
+        values += list(date_range_bounds(date_from, date_to))
+
+    columns_sql = ", ".join(f"m.{column}" for column in RESULT_COLUMNS)
+    if fts_match:
+        columns_sql += ", snippet(medical_reports_fts, -1, '[', ']', '...', 12)"
+        from_sql = "medical_reports_fts JOIN medical_reports m ON m.id = medical_reports_fts.rowid"
+    else:
+        from_sql = "medical_reports m"
+    return columns_sql, from_sql, conditions, values, fts_match, date_column
+
+def build_search_query(patient_id=None, patient_name=None, transcription_date=None, text=None,
+                       match="contains", date_from=None, date_to=None, date_field="transcription_date"):
+    """Return (sql, params, fts_match) for the search_database() arguments."""
+    columns_sql, from_sql, conditions, values, fts_match, date_column = _search_source(
+        patient_id, patient_name, transcription_date, text, match, date_from, date_to, date_field
+    )
+    query = f"SELECT {columns_sql} FROM {from_sql}"
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    if fts_match:
+        query += f" ORDER BY {FTS_RANK} LIMIT ?"
+        values.append(FTS_RESULT_LIMIT)
+    elif date_column:
+        query += f" ORDER BY {date_column}"
+
+    return query, values, fts_match
+
+def build_page_query(page_size, after_id=None, **filters):
+    """
+    Return (sql, params) for one page of search_page(): newest first, keyed on id,
+    fetching one row more than page_size to tell whether another page follows.
+    """
+    columns_sql, from_sql, conditions, values, _, _ = _search_source(**filters)
+    query = f"SELECT {columns_sql} FROM {from_sql}"
+    if after_id is not None:
+        conditions.append("m.id < ?")
+        values.append(after_id)
+    if conditions:
+        query += " WHERE " + " AND ".join(conditions)
+    query += " ORDER BY m.id DESC LIMIT ?"
+    values.append(page_size + 1)
+    return query, values
+
+class SearchRow:
+    """One search result; the same fields as the search_database() result dicts."""
+    __slots__ = ("record_id",) + RESULT_COLUMNS[1:] + ("snippet",)
+
+    def __init__(self, row):
+        for name, value in zip(self.__slots__, row):
+            setattr(self, name, value)
+        if len(row) < len(self.__slots__):
+            self.snippet = None
+        self.ambulatorio = bool(self.ambulatorio)
+        self.multiple_audios = bool(self.multiple_audios)
+
+    def as_dict(self):
+        row = {name: getattr(self, name) for name in self.__slots__}
+        if row["snippet"] is None:
+            del row["snippet"]
+        return row
 
-    if patient_name:
-        conditions.append("patient_name LIKE ?")
-        values.append(f"%{patient_name}%")
+class SearchPage:
+    """A page of SearchRow objects and the keyset token for the next page (None on the last)."""
+    __slots__ = ("rows", "next_after_id")
 
-    if transcription_date:
-        conditions.append("transcription_date LIKE ?")
-        values.append(f"%{transcription_date}%")
+    def __init__(self, rows, next_after_id):
+        self.rows = rows
+        self.next_after_id = next_after_id
 
-    query = "SELECT * FROM medical_reports"
+def search_page(db_path, page_size=SEARCH_PAGE_SIZE, after_id=None, cancel=None, **filters):
+    """
+    Return one SearchPage of results, newest record first. filters are the
+    search_database() keyword arguments; pass the page's next_after_id as after_id
+    to get the following page. Only page_size rows are ever fetched.
+    """
+    query, values = build_page_query(page_size, after_id, **filters)
+    rows = [SearchRow(row) for row in _fetch_search_rows(db_path, query, values, cancel)]
+    if len(rows) > page_size:
+        return SearchPage(rows[:page_size], rows[page_size - 1].record_id)
+    return SearchPage(rows, None)
+
+def iter_search(db_path, page_size=SEARCH_PAGE_SIZE, **filters):
+    """Yield every matching SearchRow, newest first, reading page_size rows at a time."""
+    after_id = None
+    while True:
+        page = search_page(db_path, page_size, after_id, **filters)
+        yield from page.rows
+        if page.next_after_id is None:
+            return
+        after_id = page.next_after_id
+
+def estimate_count(db_path, limit=COUNT_ESTIMATE_LIMIT, cancel=None, **filters):
+    """
+    Count the matches of a search, stopping at limit. Returns (count, exact); when
+    exact is False there are at least count matches.
+    """
+    _, from_sql, conditions, values, _, _ = _search_source(**filters)
+    query = f"SELECT 1 FROM {from_sql}"
     if conditions:
         query += " WHERE " + " AND ".join(conditions)
+    count = _fetch_search_rows(db_path, f"SELECT count(*) FROM ({query} LIMIT ?)", values + [limit], cancel)[0][0]
+    return count, count < limit
+
+def search_database(db_path, patient_id=None, patient_name=None, transcription_date=None, text=None,
+                    match="contains", date_from=None, date_to=None, date_field="transcription_date",
+                    cancel=None):
+    """
+    Search the medical_reports database based on patient_id, patient_name, or transcription_date.
+    match selects how those filters compare: "exact", "prefix" or "contains" (see
+    MATCH_MODES); patient_name is compared accent- and case-insensitively.
+    text runs a full-text query over patient name, doctor, procedure and report body;
+    results are then ranked best match first (at most FTS_RESULT_LIMIT) and carry a
+    "snippet" of the matching text.
+    date_from/date_to (DD/MM/YYYY, YYYY-MM-DD or date, both inclusive) keep the
+    reports whose date_field ("transcription_date" or "procedure_date") falls in the
+    range, oldest first; the range is answered from the ISO date column's index.
+    Repeated searches are answered from the search cache until the database changes.
+    cancel is an optional CancelToken; a cancelled search raises SearchCancelled.
+    Returns a dictionary containing the results of the search.
+    """
+    query, values, fts_match = build_search_query(patient_id, patient_name, transcription_date, text, match,
+                                                  date_from, date_to, date_field)
 
-    cursor.execute(query, values)
-    results = cursor.fetchall()
-    conn.close()
+    results = _fetch_search_rows(db_path, query, values, cancel)
 
     # Prepare the dictionary of results, including the new booleans.
     search_results = []
     for row in results:
-        search_results.append({
+        result = {
             "record_id": row[0],
             "patient_id": row[1],
             "patient_name": row[2],
@@ -153,6 +1276,347 @@ def search_database(db_path, patient_id=None, patient_name=None, transcription_d
             "pdf_file_path": row[9],
             "ambulatorio": bool(row[10]),
             "multiple_audios": bool(row[11])
-        })
+        }
+        if fts_match:
+            result["snippet"] = row[12]
+        search_results.append(result)
 
     return {"results": search_results}
+
+
+# ------------------ UNIT TESTS ------------------ #
+import tempfile
+import unittest
+
+def _record(**overrides):
+    """A row for insert_records(); keyword arguments replace its fields."""
+    record = dict(id=1, patient_id="1", patient_name="ANA", medical_procedure="ECO",
+                  procedure_date="01/01/2024", transcriptor="t", transcription_date="02/01/2024",
+                  doctor="Dr", audio_file_path="a.mp3", pdf_file_path="a.pdf",
+                  ambulatorio=0, multiple_audios=0, report_text="")
+    record.update(overrides)
+    return record
+
+class TestFullTextSearch(unittest.TestCase):
+    def test_accent_insensitive_ranked_search(self):
+        with tempfile.TemporaryDirectory() as folder:
+            db_path = os.path.join(folder, "reports.db")
+            db = MedicalReportDB(db_path)
+            db.insert_records([
+                _record(id=1, patient_name="ANA RUIZ", report_text="Hígado de tamaño normal."),
+                _record(id=2, patient_name="LUIS GÓMEZ", report_text="HEPATOMEGALÍA leve."),
+            ])
+            db.close()
+            results = search_database(db_path, text="hepatomegalia")["results"]
+            self.assertEqual([r["record_id"] for r in results], [2])
+            self.assertIn("[HEPATOMEGALÍA]", results[0]["snippet"])
+            results = search_database(db_path, text="gomez")["results"]
+            self.assertEqual([r["patient_name"] for r in results], ["LUIS GÓMEZ"])
+
+class TestSearchModes(unittest.TestCase):
+    def setUp(self):
+        self.folder = tempfile.TemporaryDirectory()
+        self.db_path = os.path.join(self.folder.name, "reports.db")
+        db = MedicalReportDB(self.db_path)
+        db.insert_records([
+            _record(id=1, patient_id="100", patient_name="JOSÉ PÉREZ", transcription_date="15/01/2024"),
+            _record(id=2, patient_id="1001", patient_name="Josefa  Ruiz", transcription_date="02/01/2024"),
+            _record(id=3, patient_id="200", patient_name="ANA JOSE", transcription_date="03/02/2024"),
+        ])
+        db.close()
+
+    def tearDown(self):
+        self.folder.cleanup()
+
+    def _ids(self, **kwargs):
+        return sorted(r["record_id"] for r in search_database(self.db_path, **kwargs)["results"])
+
+    def test_match_modes(self):
+        self.assertEqual(self._ids(patient_name="jose", match="prefix"), [1, 2])
+        self.assertEqual(self._ids(patient_name="jose perez", match="exact"), [1])
+        self.assertEqual(self._ids(patient_name="josé", match="contains"), [1, 2, 3])
+        self.assertEqual(self._ids(patient_id="100", match="prefix"), [1, 2])
+        self.assertEqual(self._ids(patient_id="100", match="exact"), [1])
+
+    def test_date_range(self):
+        results = search_database(self.db_path, date_from="01/01/2024", date_to="2024-01-31")["results"]
+        self.assertEqual([r["record_id"] for r in results], [2, 1])
+        self.assertEqual(self._ids(date_from="2024-02-01"), [3])
+        with self.assertRaises(ValueError):
+            search_database(self.db_path, date_from="31/02/2024")
+
+    def test_exact_and_prefix_use_indexes(self):
+        conn = sqlite3.connect(self.db_path)
+        indexes = {
+            "patient_id": "idx_patient_id",
+            "patient_name": "idx_patient_name_norm",
+            "transcription_date": "idx_transcription_date",
+        }
+        for mode in ("exact", "prefix"):
+            for field, index in indexes.items():
+                query, values, _ = build_search_query(match=mode, **{field: "1"})
+                plan = " ".join(row[-1] for row in conn.execute("EXPLAIN QUERY PLAN " + query, values))
+                self.assertIn(f"USING INDEX {index}", plan, (mode, field))
+        query, values, _ = build_search_query(date_from="2024-01-01", date_to="2024-01-07")
+        plan = " ".join(row[-1] for row in conn.execute("EXPLAIN QUERY PLAN " + query, values))
+        self.assertIn("USING INDEX idx_transcription_date_iso", plan)
+        conn.close()
+
+class TestSavepoint(unittest.TestCase):
+    def test_failed_row_rolls_back_alone(self):
+        with tempfile.TemporaryDirectory() as folder:
+            db = MedicalReportDB(os.path.join(folder, "reports.db"))
+            failed = []
+            # Exam types are limited to 18 characters
+            for row in (_record(id=1), _record(id=2, medical_procedure="VASCULAR TESTICULAR"), _record(id=3)):
+                try:
+                    with db.savepoint():
+                        db.insert_records([row], commit=False)
+                except sqlite3.IntegrityError:
+                    failed.append(row["id"])
+            db.commit()
+            self.assertEqual(failed, [2])
+            self.assertEqual([row[0] for row in db.conn.execute("SELECT id FROM medical_reports ORDER BY id;")], [1, 3])
+            db.close()
+
+class TestReserveId(unittest.TestCase):
+    def test_ids_are_unique_across_connections(self):
+        with tempfile.TemporaryDirectory() as folder:
+            db_path = os.path.join(folder, "reports.db")
+            # Two writers on the same file, e.g. the GUI and file_handler.py --watch
+            gui, watcher = MedicalReportDB(db_path), MedicalReportDB(db_path)
+            ids = [gui._reserve_id(), watcher._reserve_id(), gui._reserve_id()]
+            # Each writer draws from its own block
+            self.assertEqual(ids, [1, ID_BLOCK_SIZE + 1, 2])
+            watcher.insert_records([_record(id=ids[1])])
+            gui.insert_records([_record(id=ids[0]), _record(id=ids[2])])
+            self.assertEqual(watcher._reserve_id(), ID_BLOCK_SIZE + 2)
+            # Blocks reserved by two connections never overlap
+            blocks = [gui._reserve_ids(10), watcher._reserve_ids(10), gui._reserve_ids(10)]
+            reserved = [record_id for block in blocks for record_id in block]
+            self.assertEqual(len(set(reserved)), 30)
+            self.assertGreater(min(reserved), 2 * ID_BLOCK_SIZE)
+            # Inside a transaction only one ID is reserved, and a rollback gives it back
+            batch = MedicalReportDB(db_path)
+            with self.assertRaises(RuntimeError):
+                with batch.savepoint():
+                    rolled_back_id = batch._reserve_id()
+                    raise RuntimeError
+            batch.rollback()
+            self.assertEqual(batch._reserve_id(), rolled_back_id)
+            for db in (gui, watcher, batch):
+                db.close()
+
+class TestPaginatedSearch(unittest.TestCase):
+    def test_keyset_pages_and_count_estimate(self):
+        with tempfile.TemporaryDirectory() as folder:
+            db_path = os.path.join(folder, "reports.db")
+            db = MedicalReportDB(db_path)
+            db.insert_records([
+                _record(id=i, patient_id=str(i), patient_name="PEREZ" if i % 2 else "RUIZ") for i in range(1, 26)
+            ])
+            db.close()
+            page = search_page(db_path, page_size=5, patient_name="perez", match="exact")
+            self.assertEqual([row.record_id for row in page.rows], [25, 23, 21, 19, 17])
+            page = search_page(db_path, page_size=5, after_id=page.next_after_id, patient_name="perez", match="exact")
+            self.assertEqual(page.rows[0].record_id, 15)
+            ids = [row.record_id for row in iter_search(db_path, page_size=4, patient_name="perez", match="exact")]
+            self.assertEqual(ids, list(range(25, 0, -2)))
+            self.assertEqual(estimate_count(db_path, patient_name="perez", match="exact"), (13, True))
+            self.assertEqual(estimate_count(db_path, limit=10), (10, False))
+
+class TestConnectionManager(unittest.TestCase):
+    def test_search_runs_during_an_open_write_transaction(self):
+        with tempfile.TemporaryDirectory() as folder:
+            db_path = os.path.join(folder, "reports.db")
+            db = MedicalReportDB(db_path)
+            db.insert_records([_record()])
+            writing, searched = threading.Event(), threading.Event()
+
+            def writer():
+                # Uncommitted batch on the writer thread's own connection
+                db.insert_records([_record(id=2)], commit=False)
+                writing.set()
+                searched.wait(5)
+                db.commit()
+
+            thread = threading.Thread(target=writer)
+            thread.start()
+            writing.wait(5)
+            self.assertEqual([r["record_id"] for r in search_database(db_path)["results"]], [1])
+            searched.set()
+            thread.join()
+            self.assertEqual(len(db.search_records(patient_id="1")), 2)
+            db.close()
+            get_connection_manager(db_path).close()
+
+    def test_finished_threads_release_their_connection(self):
+        with tempfile.TemporaryDirectory() as folder:
+            db = MedicalReportDB(os.path.join(folder, "reports.db"))
+            opened = len(db._connections._opened)
+
+            def worker(record_id):
+                try:
+                    db.insert_records([_record(id=record_id)])
+                finally:
+                    db.release()
+
+            for record_id in range(1, 4):
+                thread = threading.Thread(target=worker, args=(record_id,))
+                thread.start()
+                thread.join()
+            self.assertEqual(len(db._connections._opened), opened)
+            self.assertEqual(db.file_refcount("a.mp3"), 3)
+            db.close()
+
+class TestSearchCache(unittest.TestCase):
+    def test_repeat_search_hits_until_an_insert(self):
+        with tempfile.TemporaryDirectory() as folder:
+            db_path = os.path.join(folder, "reports.db")
+            db = MedicalReportDB(db_path)
+            db.insert_records([_record()])
+            self.assertEqual(len(search_database(db_path, patient_id="1", match="exact")["results"]), 1)
+            self.assertEqual(len(search_database(db_path, patient_id=" 1 ", match="exact")["results"]), 1)
+            self.assertEqual(search_cache_stats(db_path)["hits"], 1)
+            db.insert_records([_record(id=2)])
+            self.assertEqual(len(search_database(db_path, patient_id="1", match="exact")["results"]), 2)
+            self.assertEqual(search_cache_stats(db_path)["misses"], 2)
+            # Closing the shared manager drops the cache with its connection
+            get_connection_manager(db_path).close()
+            self.assertEqual(len(search_database(db_path, patient_id="1", match="exact")["results"]), 2)
+            self.assertEqual(search_cache_stats(db_path)["misses"], 3)
+            db.close()
+            get_connection_manager(db_path).close()
+
+    def test_rows_are_budgeted(self):
+        with tempfile.TemporaryDirectory() as folder:
+            db_path = os.path.join(folder, "reports.db")
+            MedicalReportDB(db_path).close()
+            manager = ConnectionManager(db_path)
+            cache = SearchCache(manager, max_rows=5)
+            _, version = cache.lookup("a")
+            cache.store("a", [(1,), (2,), (3,)], version)
+            cache.store("b", [(4,), (5,)], version)
+            cache.store("huge", [(i,) for i in range(6)], version)    # Over the whole budget: skipped
+            self.assertEqual(cache.lookup("huge")[0], None)
+            self.assertEqual(cache.lookup("a")[0], [(1,), (2,), (3,)])
+            # "b" is now the least recently used, and goes to make room
+            cache.store("c", [(6,)], version)
+            self.assertEqual(cache.lookup("b")[0], None)
+            self.assertEqual(cache.lookup("c")[0], [(6,)])
+            manager.close()
+
+class TestStorageMigration(unittest.TestCase):
+    def test_flat_files_move_to_hash_layout(self):
+        with tempfile.TemporaryDirectory() as folder:
+            db_path = os.path.join(folder, "reports.db")
+            db = MedicalReportDB(db_path, storage_layout="flat")
+            for i in range(3):
+                for ext in (".mp3", ".pdf"):
+                    with open(os.path.join(folder, f"{i}{ext}"), "wb") as f:
+                        f.write(b"data")
+                record = db.prepare_record(str(i), "ANA", "ECO", "01/01/2024", "t", "02/01/2024", "Dr",
+                                           os.path.join(folder, f"{i}.mp3"), os.path.join(folder, f"{i}.pdf"))
+                db.write_record(record)
+            db.close()
+            db = MedicalReportDB(db_path, storage_layout="hash")
+            self.assertEqual(db.migrate_storage(batch_size=2), 6)
+            for _, name, audio_path, pdf_path in db.conn.execute(
+                    "SELECT id, patient_name, audio_file_path, pdf_file_path FROM medical_reports;"):
+                self.assertEqual(audio_path, db.storage_path(db.audio_folder, os.path.basename(audio_path)))
+                self.assertTrue(os.path.exists(audio_path) and os.path.exists(pdf_path))
+            # Nothing left to move; the text index is untouched by path updates
+            self.assertEqual(db.migrate_storage(), 0)
+            self.assertEqual(len(search_database(db_path, patient_name="ana")["results"]), 3)
+            db.close()
+            get_connection_manager(db_path).close()
+
+class TestContentStore(unittest.TestCase):
+    def test_duplicates_stored_once_with_refcounts(self):
+        with tempfile.TemporaryDirectory() as folder:
+            db_path = os.path.join(folder, "reports.db")
+            db = MedicalReportDB(db_path, storage_layout="content")
+            records = []
+            for i in range(3):
+                # Same audio each time, a different PDF for the last record
+                with open(os.path.join(folder, f"{i}.mp3"), "wb") as f:
+                    f.write(b"audio")
+                with open(os.path.join(folder, f"{i}.pdf"), "wb") as f:
+                    f.write(b"pdf" if i < 2 else b"other pdf")
+                record = db.prepare_record(str(i), "ANA", "ECO", "01/01/2024", "t", "02/01/2024", "Dr",
+                                           os.path.join(folder, f"{i}.mp3"), os.path.join(folder, f"{i}.pdf"))
+                records.append(record)
+            db.insert_records(records[:2])
+            self.assertEqual(len({r["audio_file_path"] for r in records}), 1)
+            self.assertEqual(db.file_refcount(records[0]["audio_file_path"]), 2)
+            # Undoing an unwritten record leaves the shared blob for the stored ones,
+            # and takes back the blob only it used
+            db.unstore_record(records[2])
+            self.assertTrue(os.path.exists(os.path.join(folder, "2.mp3")))
+            self.assertTrue(os.path.exists(records[0]["audio_file_path"]))
+            self.assertFalse(os.path.exists(records[2]["pdf_file_path"]))
+            with open(os.path.join(folder, "2.pdf"), "rb") as f:
+                self.assertEqual(f.read(), b"other pdf")
+            # A stored copy of the same size but other content is replaced, not reused
+            with open(records[0]["pdf_file_path"], "wb") as f:
+                f.write(b"PDF")
+            with open(os.path.join(folder, "3.pdf"), "wb") as f:
+                f.write(b"pdf")
+            db._store_file(os.path.join(folder, "3.pdf"), records[0]["pdf_file_path"])
+            with open(records[0]["pdf_file_path"], "rb") as f:
+                self.assertEqual(f.read(), b"pdf")
+            db.conn.execute("DELETE FROM medical_reports WHERE id = ?;", (records[0]["id"],))
+            self.assertEqual(db.file_refcount(records[0]["pdf_file_path"]), 1)
+            db.close()
+
+class TestArchive(unittest.TestCase):
+    def test_archive_month_then_copy_out(self):
+        with tempfile.TemporaryDirectory() as folder:
+            db_path = os.path.join(folder, "reports.db")
+            db = MedicalReportDB(db_path, storage_layout="hash")
+            records = []
+            for i, procedure_date in enumerate(("05/01/2023", "20/01/2023", "03/02/2023")):
+                for ext in (".mp3", ".pdf"):
+                    with open(os.path.join(folder, f"{i}{ext}"), "wb") as f:
+                        f.write(f"{i}{ext}".encode() * 100)
+                records.append(db.prepare_record(str(i), "ANA", "ECO", procedure_date, "t", "02/01/2024", "Dr",
+                                                 os.path.join(folder, f"{i}.mp3"), os.path.join(folder, f"{i}.pdf")))
+            db.insert_records(records)
+            # A bundle left behind by an interrupted run is discarded, but not while another
+            # process may still be writing it
+            open(os.path.join(db.archive_folder, "2023-01.1.zip"), "wb").close()
+            other = MedicalReportDB(db_path)
+            with other._archive_process_lock() as locked:
+                self.assertTrue(locked)
+                self.assertEqual(db.archive_month("2023-01"), 0)
+                self.assertTrue(os.path.exists(os.path.join(db.archive_folder, "2023-01.1.zip")))
+            other.close()
+            self.assertEqual(db.archive_month("2023-01"), 4)
+            self.assertEqual(db.archive_month("2023-01"), 0)
+            self.assertFalse(os.path.exists(records[0]["pdf_file_path"]))
+            self.assertTrue(os.path.exists(records[2]["pdf_file_path"]))
+            dest = os.path.join(folder, "copy.pdf")
+            copy_stored_file(db_path, records[1]["pdf_file_path"], dest)
+            with open(dest, "rb") as f:
+                self.assertEqual(f.read(), b"1.pdf" * 100)
+            self.assertEqual(db.verify_archives(), [])
+            # Archived files are not touched by a layout migration
+            self.assertEqual(MedicalReportDB(db_path, storage_layout="flat").migrate_storage(), 2)
+            db.close()
+            get_connection_manager(db_path).close()
+
+class TestCancelToken(unittest.TestCase):
+    def test_cancel_interrupts_running_query(self):
+        with tempfile.TemporaryDirectory() as folder:
+            db_path = os.path.join(folder, "reports.db")
+            MedicalReportDB(db_path).close()
+            token = CancelToken()
+            threading.Timer(0.2, token.cancel).start()
+            endless = "WITH RECURSIVE c(x) AS (SELECT 1 UNION ALL SELECT x + 1 FROM c) SELECT count(*) FROM c"
+            with self.assertRaises(SearchCancelled):
+                _fetch_search_rows(db_path, endless, [], token)
+            # The pooled reader is still usable, and a cancelled token stops later queries
+            self.assertEqual(search_database(db_path)["results"], [])
+            with self.assertRaises(SearchCancelled):
+                search_page(db_path, cancel=token)
+            get_connection_manager(db_path).close()
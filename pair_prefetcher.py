@@ -0,0 +1,96 @@
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from info_extractor import get_requested_info
+
+WARM_CHUNK_SIZE = 1024 * 1024
+
+
+def warm_file(path, chunk_size=WARM_CHUNK_SIZE):
+    """Get a file into the OS cache ahead of time, so opening it later does not hit the disk."""
+    if hasattr(os, "posix_fadvise"):
+        fd = os.open(path, os.O_RDONLY)
+        try:
+            os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+        finally:
+            os.close(fd)
+        return
+    with open(path, "rb") as f:
+        while f.read(chunk_size):
+            pass
+
+
+class PairPrefetcher:
+    """
+    Extracts the PDF info of the next few (audio, pdf) pairs and warms their audio
+    on a background thread, so showing a pair does not wait on PDF parsing.
+
+    prefetch() is called with the pair about to be shown; it keeps that pair and
+    the following `lookahead` ones scheduled and forgets the rest. future() hands
+    out the concurrent.futures.Future of a pair's info dict.
+    """
+
+    def __init__(self, lookahead=3, extract=get_requested_info):
+        self.lookahead = lookahead
+        self.extract = extract
+        # One worker: the pair shown next is always first in line
+        self._executor = ThreadPoolExecutor(max_workers=1, thread_name_prefix="pair-prefetch")
+        self._futures = {}      # pdf path -> Future
+        self._lock = threading.Lock()
+
+    def _load(self, audio_path, pdf_path):
+        if audio_path:
+            try:
+                warm_file(audio_path)
+            except OSError:
+                pass    # Only a hint; playback reports a missing file
+        return self.extract(pdf_path)
+
+    def prefetch(self, pairs, index):
+        """Schedule pairs[index] and the `lookahead` pairs after it."""
+        window = pairs[index:index + self.lookahead + 1]
+        wanted = {pdf_path for _, pdf_path in window}
+        with self._lock:
+            for pdf_path in list(self._futures):
+                if pdf_path not in wanted:
+                    self._futures.pop(pdf_path).cancel()
+            for audio_path, pdf_path in window:
+                if pdf_path not in self._futures:
+                    self._futures[pdf_path] = self._executor.submit(self._load, audio_path, pdf_path)
+
+    def future(self, audio_path, pdf_path):
+        """Future of pdf_path's info, scheduled now if it was not prefetched."""
+        with self._lock:
+            if pdf_path not in self._futures:
+                self._futures[pdf_path] = self._executor.submit(self._load, audio_path, pdf_path)
+            return self._futures[pdf_path]
+
+    def clear(self):
+        """Drop everything scheduled; running extractions finish in the background."""
+        self.prefetch([], 0)
+
+
+# ------------------ UNIT TESTS ------------------ #
+import tempfile
+import unittest
+
+class TestPairPrefetcher(unittest.TestCase):
+    def test_window_is_extracted_ahead(self):
+        with tempfile.TemporaryDirectory() as folder:
+            pairs = []
+            for i in range(5):
+                audio_path = os.path.join(folder, f"{i}.mp3")
+                with open(audio_path, "wb") as f:
+                    f.write(b"audio")
+                pairs.append((audio_path, f"{i}.pdf"))
+            extracted = []
+            prefetcher = PairPrefetcher(lookahead=2, extract=lambda pdf: extracted.append(pdf) or {"pdf": pdf})
+            prefetcher.prefetch(pairs, 0)
+            self.assertEqual(prefetcher.future(*pairs[2]).result(timeout=5), {"pdf": "2.pdf"})
+            self.assertEqual(extracted, ["0.pdf", "1.pdf", "2.pdf"])
+            # Moving on drops pairs behind and schedules the next one
+            prefetcher.prefetch(pairs, 1)
+            prefetcher.future(*pairs[3]).result(timeout=5)
+            self.assertEqual(sorted(prefetcher._futures), ["1.pdf", "2.pdf", "3.pdf"])
+            self.assertEqual(extracted.count("1.pdf"), 1)
@@ -0,0 +1,459 @@
+import re
+import zlib
+from abc import ABC, abstractmethod
+from collections import namedtuple
+
+# A piece of text drawn on the page, with its font and position
+TextRun = namedtuple("TextRun", "text font x y")
+
+
+class FastDecodeError(Exception):
+    """Raised when the raw decoder cannot handle a document; use another backend."""
+
+
+def extract_page_runs(page):
+    """
+    Extract the text of a PyPDF2 page together with its TextRuns, in one pass.
+    """
+    runs = []
+
+    def visitor(text, cm, tm, font_dict, font_size):
+        if not text or not text.strip():
+            return
+        x = tm[4] * cm[0] + tm[5] * cm[2] + cm[4]
+        y = tm[4] * cm[1] + tm[5] * cm[3] + cm[5]
+        font = font_dict.get("/BaseFont", "") if font_dict else ""
+        runs.append(TextRun(text, str(font), x, y))
+
+    text = page.extract_text(visitor_text=visitor) or ""
+    return text, runs
+
+
+# ------------------ BACKEND INTERFACE ------------------ #
+class PdfDocument(ABC):
+    """
+    An open PDF as seen by the extractor: a page count, the text of any page
+    and the text runs of the first page. Use as a context manager.
+    """
+    page_count = 0
+
+    @abstractmethod
+    def page_text(self, index: int) -> str:
+        """Return the text of page index."""
+
+    @abstractmethod
+    def first_page_runs(self):
+        """Return (text, runs) for the first page."""
+
+    def close(self) -> None:
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.close()
+
+
+class PdfTextBackend(ABC):
+    """Opens PdfDocuments. Subclasses set a short name used in configuration."""
+    name = ""
+
+    @abstractmethod
+    def open(self, file_path: str) -> PdfDocument:
+        """Open file_path; the caller closes the returned document."""
+
+
+# ------------------ PyPDF2 BACKEND ------------------ #
+class PyPDF2Document(PdfDocument):
+    def __init__(self, file_path: str):
+        import PyPDF2  # Imported on first use: it is slow to load and not needed at startup
+        self._file = open(file_path, "rb")
+        try:
+            self._reader = PyPDF2.PdfReader(self._file)
+            self.page_count = len(self._reader.pages)
+        except Exception:
+            self._file.close()
+            raise
+
+    def page_text(self, index: int) -> str:
+        return self._reader.pages[index].extract_text() or ""
+
+    def first_page_runs(self):
+        return extract_page_runs(self._reader.pages[0])
+
+    def close(self) -> None:
+        self._file.close()
+
+
+class PyPDF2Backend(PdfTextBackend):
+    """Full object model through PyPDF2: handles any PDF, at PyPDF2's cost."""
+    name = "pypdf2"
+
+    def open(self, file_path: str) -> PdfDocument:
+        return PyPDF2Document(file_path)
+
+
+# ------------------ RAW CONTENT-STREAM BACKEND ------------------ #
+OBJECT_RE = re.compile(rb"(\d+)\s+(\d+)\s+obj\b")
+REF_RE = rb"(\d+)\s+\d+\s+R"
+ROOT_RE = re.compile(rb"/Root\s+" + REF_RE)
+PAGES_RE = re.compile(rb"/Pages\s+" + REF_RE)
+KIDS_RE = re.compile(rb"/Kids\s*\[([^\]]*)\]")
+COUNT_RE = re.compile(rb"/Count\s+(\d+)")
+CONTENTS_RE = re.compile(rb"/Contents\s*(\[[^\]]*\]|" + REF_RE + rb")")
+REFS_RE = re.compile(REF_RE)
+LENGTH_RE = re.compile(rb"/Length\s+(\d+)\b(?!\s+\d+\s+R)")
+FILTER_RE = re.compile(rb"/Filter\s*(\[[^\]]*\]|/\w+)")
+NAME_RE = re.compile(rb"/(\w+)")
+STREAM_RE = re.compile(rb"stream\r?\n")
+
+CONTENT_TOKEN_RE = re.compile(rb"""
+    (?P<space>\s+|%[^\r\n]*)
+  | (?P<hex><[0-9A-Fa-f\s]*>)
+  | (?P<dict><<|>>)
+  | (?P<array>[\[\]])
+  | (?P<name>/[^\s/\[\]()<>{}%]*)
+  | (?P<number>[+-]?(?:\d+\.?\d*|\.\d+))
+  | (?P<literal>\()
+  | (?P<operator>[A-Za-z'"*][A-Za-z0-9'"*]*)
+""", re.VERBOSE)
+LITERAL_ESCAPES = {b"n": b"\n", b"r": b"\r", b"t": b"\t", b"b": b"\b", b"f": b"\f"}
+# Single bytes, so the empty slice at the end of the data is not a digit
+OCTAL_DIGITS = tuple(bytes([digit]) for digit in b"01234567")
+# TJ adjustments larger than this (thousandths of an em) are gaps between words
+TJ_SPACE_THRESHOLD = 200
+
+
+def _read_literal(data: bytes, pos: int):
+    """Read a (...) string starting after its opening parenthesis."""
+    out = bytearray()
+    depth = 1
+    while pos < len(data):
+        c = data[pos:pos + 1]
+        pos += 1
+        if c == b"\\":
+            nxt = data[pos:pos + 1]
+            pos += 1
+            if nxt in LITERAL_ESCAPES:
+                out += LITERAL_ESCAPES[nxt]
+            elif nxt in OCTAL_DIGITS:
+                digits = nxt
+                while len(digits) < 3 and data[pos:pos + 1] in OCTAL_DIGITS:
+                    digits += data[pos:pos + 1]
+                    pos += 1
+                out.append(int(digits, 8) & 0xFF)
+            elif nxt in (b"\r", b"\n"):
+                if nxt == b"\r" and data[pos:pos + 1] == b"\n":
+                    pos += 1
+            else:
+                out += nxt
+        elif c == b"(":
+            depth += 1
+            out += c
+        elif c == b")":
+            depth -= 1
+            if depth == 0:
+                return bytes(out), pos
+            out += c
+        else:
+            out += c
+    raise FastDecodeError("Unterminated string in content stream")
+
+
+def _decode_string(raw: bytes) -> str:
+    # Simple text-only reports use single-byte WinAnsi fonts
+    return raw.decode("cp1252", errors="replace")
+
+
+def _content_runs(content: bytes) -> list:
+    """Interpret the text operators (BT/ET, Tf, Td/TD/Tm/T*, Tj/TJ/'/") of a content stream."""
+    runs = []
+    operands = []
+    arrays = []
+    font = ""
+    leading = 0.0
+    line_matrix = [1.0, 0.0, 0.0, 1.0, 0.0, 0.0]
+
+    def move(tx, ty):
+        a, b, c, d, e, f = line_matrix
+        line_matrix[4] = e + tx * a + ty * c
+        line_matrix[5] = f + tx * b + ty * d
+
+    def show(text):
+        if text.strip():
+            runs.append(TextRun(text, font, line_matrix[4], line_matrix[5]))
+
+    pos = 0
+    while pos < len(content):
+        match = CONTENT_TOKEN_RE.match(content, pos)
+        if not match:
+            raise FastDecodeError(f"Unexpected byte {content[pos:pos + 1]!r} in content stream")
+        pos = match.end()
+        kind = match.lastgroup
+        token = match.group(kind)
+        if kind == "space" or kind == "dict":
+            continue
+        if kind == "literal":
+            value, pos = _read_literal(content, pos)
+            value = _decode_string(value)
+        elif kind == "hex":
+            digits = re.sub(rb"\s", b"", token[1:-1])
+            value = _decode_string(bytes.fromhex((digits + b"0" * (len(digits) % 2)).decode("ascii")))
+        elif kind == "number":
+            value = float(token)
+        elif kind == "name":
+            value = token[1:].decode("latin-1")
+        elif kind == "array":
+            if token == b"[":
+                arrays.append([])
+            elif arrays:
+                value = arrays.pop()
+                (arrays[-1] if arrays else operands).append(value)
+            continue
+        else:
+            op = token.decode("latin-1")
+            if op == "BI":
+                raise FastDecodeError("Inline images are not supported")
+            if op == "BT":
+                line_matrix[:] = [1.0, 0.0, 0.0, 1.0, 0.0, 0.0]
+            elif op == "Tf" and len(operands) >= 2:
+                font = str(operands[-2])
+            elif op == "TL" and operands:
+                leading = operands[-1]
+            elif op in ("Td", "TD") and len(operands) >= 2:
+                move(operands[-2], operands[-1])
+                if op == "TD":
+                    leading = -operands[-1]
+            elif op == "Tm" and len(operands) >= 6:
+                line_matrix[:] = operands[-6:]
+            elif op == "T*":
+                move(0, -leading)
+            elif op == "Tj" and operands:
+                show(str(operands[-1]))
+            elif op in ("'", '"') and operands:
+                move(0, -leading)
+                show(str(operands[-1]))
+            elif op == "TJ" and operands and isinstance(operands[-1], list):
+                pieces = []
+                for item in operands[-1]:
+                    if isinstance(item, str):
+                        pieces.append(item)
+                    elif item < -TJ_SPACE_THRESHOLD:
+                        pieces.append(" ")
+                show("".join(pieces))
+            operands = []
+            continue
+        (arrays[-1] if arrays else operands).append(value)
+    return runs
+
+
+def _runs_to_text(runs) -> str:
+    """Lay runs out as lines: a new baseline starts a new line, a jump right adds a space."""
+    lines = []
+    previous = None
+    for run in runs:
+        if previous is None or run.y != previous.y:
+            lines.append(run.text)
+        elif run.x != previous.x and not lines[-1].endswith(" ") and not run.text.startswith(" "):
+            lines[-1] += " " + run.text
+        else:
+            lines[-1] += run.text
+        previous = run
+    return "\n".join(lines)
+
+
+class RawStreamDocument(PdfDocument):
+    """
+    Reads only what a text-only report needs: the page tree and, when a page is
+    first asked for, its (Flate-decoded) content streams. Anything else (object
+    streams, other filters, inline images) raises FastDecodeError so the caller
+    can fall back to PyPDF2.
+    """
+
+    def __init__(self, file_path: str):
+        with open(file_path, "rb") as f:
+            self._data = f.read()
+        self._offsets = {}
+        for match in OBJECT_RE.finditer(self._data):
+            # Later definitions win, as with incremental updates
+            self._offsets[int(match.group(1))] = match.end()
+
+        root = self._object(self._last_ref(ROOT_RE, self._data, "/Root"))
+        pages_ref = self._ref(PAGES_RE, root, "/Pages")
+        count = COUNT_RE.search(self._object(pages_ref))
+        self._pages = self._page_refs(pages_ref, set())
+        if not self._pages or (count and int(count.group(1)) != len(self._pages)):
+            raise FastDecodeError("Page tree does not match its /Count")
+        self.page_count = len(self._pages)
+        self._decoded = {}      # page index -> (text, runs)
+
+    def _page_refs(self, number: int, seen: set) -> list:
+        """Object numbers of the pages under page tree node number, in order."""
+        if number in seen:
+            raise FastDecodeError("Page tree has a cycle")
+        seen.add(number)
+        kids = KIDS_RE.search(self._object(number))
+        if not kids:
+            return [number]
+        pages = []
+        for ref in REFS_RE.findall(kids.group(1)):
+            pages += self._page_refs(int(ref), seen)
+        return pages
+
+    def _page(self, index: int):
+        if index not in self._decoded:
+            try:
+                self._decoded[index] = self._decode_page(index)
+            except FastDecodeError:
+                raise
+            except Exception as e:
+                # Pages are decoded after open() succeeded; "auto" still needs a FastDecodeError to fall back
+                raise FastDecodeError(f"Raw decoding of page {index} failed: {e}")
+        return self._decoded[index]
+
+    def _decode_page(self, index: int):
+        contents = CONTENTS_RE.search(self._object(self._pages[index]))
+        if not contents:
+            raise FastDecodeError(f"Page {index} has no /Contents")
+        stream = b"\n".join(self._stream(int(ref)) for ref in REFS_RE.findall(contents.group(1)))
+        runs = _content_runs(stream)
+        return _runs_to_text(runs), runs
+
+    @staticmethod
+    def _ref(pattern, body, what):
+        match = pattern.search(body)
+        if not match:
+            raise FastDecodeError(f"Missing {what} reference")
+        return int(match.group(1))
+
+    @staticmethod
+    def _last_ref(pattern, body, what):
+        matches = pattern.findall(body)
+        if not matches:
+            raise FastDecodeError(f"Missing {what} reference")
+        return int(matches[-1])
+
+    def _object(self, number: int) -> bytes:
+        start = self._offsets.get(number)
+        if start is None:
+            # Probably stored inside a compressed object stream
+            raise FastDecodeError(f"Object {number} not found")
+        end = self._data.find(b"endobj", start)
+        return self._data[start:end if end != -1 else len(self._data)]
+
+    def _stream(self, number: int) -> bytes:
+        body = self._object(number)
+        start = STREAM_RE.search(body)
+        if not start:
+            raise FastDecodeError(f"Object {number} is not a stream")
+        header = body[:start.start()]
+        length = LENGTH_RE.search(header)
+        if length:
+            raw = body[start.end():start.end() + int(length.group(1))]
+        else:
+            raw = body[start.end():body.rfind(b"endstream")].rstrip(b"\r\n")
+        filter_value = FILTER_RE.search(header)
+        filters = NAME_RE.findall(filter_value.group(1)) if filter_value else []
+        if not filters:
+            return raw
+        if filters != [b"FlateDecode"]:
+            raise FastDecodeError(f"Unsupported stream filter {filters!r}")
+        try:
+            return zlib.decompress(raw)
+        except zlib.error as e:
+            raise FastDecodeError(f"Bad Flate stream: {e}")
+
+    def page_text(self, index: int) -> str:
+        return self._page(index)[0]
+
+    def first_page_runs(self):
+        return self._page(0)
+
+
+class RawStreamBackend(PdfTextBackend):
+    """Lightweight decoder for simple text reports; no object model."""
+    name = "raw"
+
+    def open(self, file_path: str) -> PdfDocument:
+        try:
+            return RawStreamDocument(file_path)
+        except FastDecodeError:
+            raise
+        except Exception as e:
+            raise FastDecodeError(f"Raw decoding failed: {e}")
+
+
+BACKENDS = {backend.name: backend for backend in (PyPDF2Backend(), RawStreamBackend())}
+
+
+# ------------------ UNIT TESTS ------------------ #
+import os
+import tempfile
+import unittest
+
+class TestContentStreamDecoder(unittest.TestCase):
+    def test_text_operators(self):
+        content = (b"BT /F1 10 Tf 50 700 Td (Paciente : ROMERO) Tj 250 0 Td (Documento : CC 1) Tj "
+                   b"14 TL T* [(Fe) -20 (cha) -400 (:) ] TJ ET")
+        runs = _content_runs(content)
+        self.assertEqual([run.text for run in runs], ["Paciente : ROMERO", "Documento : CC 1", "Fecha :"])
+        self.assertEqual((runs[1].font, runs[1].x, runs[1].y), ("F1", 300.0, 700.0))
+        self.assertEqual(_runs_to_text(runs), "Paciente : ROMERO Documento : CC 1\nFecha :")
+
+    def test_string_escapes(self):
+        runs = _content_runs(b"BT (Transcripci\\363n \\(a\\)) Tj <4E726F> Tj ET")
+        self.assertEqual([run.text for run in runs], ["Transcripción (a)", "Nro"])
+        # Octal escapes stop at the first non-octal digit; \8 and \9 just drop the backslash
+        runs = _content_runs(b"BT (\\618 \\9) Tj ET")
+        self.assertEqual([run.text for run in runs], ["18 9"])
+
+
+def _build_pdf(page_contents) -> bytes:
+    """A minimal PDF: one Flate-compressed content stream per page."""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>", b""]
+    kids = []
+    for content in page_contents:
+        kids.append(b"%d 0 R" % (len(objects) + 1))
+        objects.append(b"<< /Type /Page /Parent 2 0 R /Contents %d 0 R >>" % (len(objects) + 2))
+        data = zlib.compress(content)
+        objects.append(b"<< /Length %d /Filter /FlateDecode >>\nstream\n" % len(data) + data + b"\nendstream")
+    objects[1] = b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b" ".join(kids), len(kids))
+    pdf = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(pdf))
+        pdf += b"%d 0 obj\n" % number + body + b"\nendobj\n"
+    xref = len(pdf)
+    pdf += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    pdf += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    pdf += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(pdf)
+
+class TestRawStreamDocument(unittest.TestCase):
+    def test_multi_page_document(self):
+        pdf = _build_pdf([
+            b"BT /F1 10 Tf 50 700 Td (Paciente : ROMERO) Tj 0 -14 Td (Fecha : 08/07/2024) Tj ET",
+            b"BT /F1 10 Tf 50 100 Td (Dra. Lynda Carvajal) Tj ET",
+        ])
+        with tempfile.TemporaryDirectory() as folder:
+            path = os.path.join(folder, "report.pdf")
+            with open(path, "wb") as f:
+                f.write(pdf)
+            with RawStreamBackend().open(path) as document:
+                self.assertEqual(document.page_count, 2)
+                text, runs = document.first_page_runs()
+                self.assertEqual(text, "Paciente : ROMERO\nFecha : 08/07/2024")
+                self.assertEqual((runs[1].x, runs[1].y), (50.0, 686.0))
+                self.assertEqual(document.page_text(1), "Dra. Lynda Carvajal")
+            # A page tree that disagrees with its /Count is left to PyPDF2
+            with open(path, "wb") as f:
+                f.write(pdf.replace(b"/Count 2", b"/Count 3"))
+            with self.assertRaises(FastDecodeError):
+                RawStreamBackend().open(path)
+            # Errors found while decoding a page, after open(), are FastDecodeErrors too
+            with open(path, "wb") as f:
+                f.write(_build_pdf([b"BT (a) (b) Td ET"]))
+            with RawStreamBackend().open(path) as document:
+                with self.assertRaises(FastDecodeError):
+                    document.page_text(0)
@@ -0,0 +1,207 @@
+import ctypes
+import ctypes.util
+import os
+import select
+import struct
+import sys
+import time
+from pathlib import Path
+
+# inotify(7) constants
+IN_MODIFY = 0x00000002
+IN_CLOSE_WRITE = 0x00000008
+IN_MOVED_TO = 0x00000080
+IN_CREATE = 0x00000100
+IN_Q_OVERFLOW = 0x00004000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+INOTIFY_EVENT = struct.Struct("iIII")
+
+
+class InotifySource:
+    """
+    Reports names of files created, written or moved into a folder (Linux only).
+    Raises OSError if inotify is not available.
+    """
+
+    def __init__(self, folder):
+        libc = ctypes.CDLL(ctypes.util.find_library("c") or None, use_errno=True)
+        self._fd = libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self._fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        mask = IN_MODIFY | IN_CLOSE_WRITE | IN_MOVED_TO | IN_CREATE
+        if libc.inotify_add_watch(self._fd, os.fsencode(folder), mask) < 0:
+            errno = ctypes.get_errno()
+            os.close(self._fd)
+            raise OSError(errno, f"inotify_add_watch failed for {folder}")
+
+    def wait(self, timeout):
+        """
+        Wait up to timeout seconds. Returns the set of changed names, or None when
+        the kernel queue overflowed and the caller must rescan the folder.
+        """
+        ready, _, _ = select.select([self._fd], [], [], timeout)
+        if not ready:
+            return set()
+        try:
+            data = os.read(self._fd, 64 * 1024)
+        except BlockingIOError:
+            return set()
+        names = set()
+        offset = 0
+        while offset < len(data):
+            _, mask, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+            offset += INOTIFY_EVENT.size
+            if mask & IN_Q_OVERFLOW:
+                return None
+            name = data[offset:offset + length].rstrip(b"\0")
+            offset += length
+            if name:
+                names.add(os.fsdecode(name))
+        return names
+
+    def close(self):
+        os.close(self._fd)
+
+
+class PollingSource:
+    """
+    Fallback change source: compares scandir() snapshots of (size, mtime) per file.
+    """
+
+    def __init__(self, folder):
+        self.folder = folder
+        self._snapshot = {}
+
+    def wait(self, timeout):
+        time.sleep(timeout)
+        snapshot = {}
+        with os.scandir(self.folder) as entries:
+            for entry in entries:
+                if entry.is_file():
+                    st = entry.stat()
+                    snapshot[entry.name] = (st.st_size, st.st_mtime_ns)
+        changed = {name for name, state in snapshot.items() if self._snapshot.get(name) != state}
+        self._snapshot = snapshot
+        return changed
+
+    def close(self):
+        pass
+
+
+class ReceiverWatcher:
+    """
+    Watches a folder for incoming document/audio pairs.
+
+    A file is considered complete once its size and mtime have not changed for
+    stable_seconds. As soon as both files sharing a stem are complete,
+    on_pair(doc_path, audio_path) is called. Only files reported as changed are
+    stat'ed, so the folder is not rescanned on every tick (except when polling).
+    """
+
+    def __init__(self, folder, on_pair, doc_extensions, audio_extensions,
+                 stable_seconds=2.0, poll_interval=1.0, use_inotify=None):
+        self.folder = folder
+        self.on_pair = on_pair
+        self.doc_extensions = {ext.lower() for ext in doc_extensions}
+        self.audio_extensions = {ext.lower() for ext in audio_extensions}
+        self.stable_seconds = stable_seconds
+        self.poll_interval = poll_interval
+        if use_inotify is None:
+            use_inotify = sys.platform.startswith("linux")
+        self._use_inotify = use_inotify
+        self._pending = {}      # name -> ((size, mtime_ns), unchanged since)
+        self._ready = {}        # stem -> {"doc": path, "audio": path}
+
+    def _open_source(self):
+        if self._use_inotify:
+            try:
+                return InotifySource(self.folder)
+            except (OSError, AttributeError) as e:
+                print(f"inotify unavailable ({e}); polling {self.folder} instead.")
+        return PollingSource(self.folder)
+
+    def _kind(self, name):
+        ext = Path(name).suffix.lower()
+        if ext in self.doc_extensions:
+            return "doc"
+        if ext in self.audio_extensions:
+            return "audio"
+        return None
+
+    def _mark(self, names):
+        for name in names:
+            if self._kind(name) and name not in self._pending:
+                self._pending[name] = (None, time.monotonic())
+
+    def _scan_all(self):
+        with os.scandir(self.folder) as entries:
+            self._mark(entry.name for entry in entries if entry.is_file())
+
+    def _check_pending(self):
+        now = time.monotonic()
+        for name, (state, since) in list(self._pending.items()):
+            path = os.path.join(self.folder, name)
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                del self._pending[name]
+                continue
+            current = (st.st_size, st.st_mtime_ns)
+            if current != state:
+                self._pending[name] = (current, now)
+            elif now - since >= self.stable_seconds:
+                del self._pending[name]
+                self._file_ready(name, path)
+
+    def _file_ready(self, name, path):
+        stem = Path(name).stem
+        entry = self._ready.setdefault(stem, {})
+        entry[self._kind(name)] = path
+        if "doc" in entry and "audio" in entry:
+            del self._ready[stem]
+            if os.path.exists(entry["doc"]) and os.path.exists(entry["audio"]):
+                try:
+                    self.on_pair(entry["doc"], entry["audio"])
+                except Exception as e:
+                    print(f"Error processing group '{stem}': {e}")
+
+    def run(self, stop_event):
+        """Watch until stop_event (a threading.Event) is set."""
+        source = self._open_source()
+        try:
+            # Files already waiting when the watcher starts count as arrivals
+            self._scan_all()
+            while not stop_event.is_set():
+                changed = source.wait(self.poll_interval)
+                if changed is None:
+                    self._scan_all()
+                else:
+                    self._mark(changed)
+                # A file being rewritten restarts its stability timer
+                for name in changed or ():
+                    if name in self._pending:
+                        self._pending[name] = (None, time.monotonic())
+                self._check_pending()
+        finally:
+            source.close()
+
+
+# ------------------ UNIT TESTS ------------------ #
+import tempfile
+import unittest
+
+class TestReceiverWatcher(unittest.TestCase):
+    def test_pairs_by_stem_once_both_files_are_stable(self):
+        with tempfile.TemporaryDirectory() as folder:
+            for name in ("a.pdf", "a.mp3", "b.pdf", "notes.txt"):
+                with open(os.path.join(folder, name), "wb") as f:
+                    f.write(b"data")
+            pairs = []
+            watcher = ReceiverWatcher(folder, lambda doc, audio: pairs.append((doc, audio)),
+                                      {".pdf"}, {".mp3"}, stable_seconds=0.0, use_inotify=False)
+            watcher._scan_all()
+            watcher._check_pending()   # first stat: sizes recorded
+            watcher._check_pending()   # unchanged: files ready
+            self.assertEqual(pairs, [(os.path.join(folder, "a.pdf"), os.path.join(folder, "a.mp3"))])
+            self.assertIn("b", watcher._ready)
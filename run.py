@@ -1,6 +1,38 @@
-from tkinter_app import MainApp
+import time
+
+STARTED = time.perf_counter()
+
+import sys
 
 if __name__ == "__main__":
+    # Needed for the PDF extraction process pool in the frozen executable; it runs
+    # before the GUI imports so worker processes never load them. Running from
+    # source, multiprocessing is only imported once a batch needs the pool
+    if getattr(sys, "frozen", False):
+        import multiprocessing
+        multiprocessing.freeze_support()
+
+    # --startup-report: time the imports and phases up to the menu being shown
+    timer = None
+    if "--startup-report" in sys.argv:
+        from startup_timing import StartupTimer
+        timer = StartupTimer(start=STARTED)
+        timer.track_imports()
+
+    from tkinter_app import MainApp
+    if timer:
+        timer.stop_tracking()
+        timer.mark("imports")
+
     app = MainApp()
+    if timer:
+        timer.mark("main window built")
+
+        def menu_shown():
+            timer.mark("menu shown")
+            from config import BASE_DIR
+            print(timer.report())
+            print(f"Startup report written to {timer.save_report(BASE_DIR)}")
+
+        app.after_idle(menu_shown)
     app.mainloop()
-    
\ No newline at end of file
@@ -0,0 +1,99 @@
+import importlib._bootstrap
+import os
+import sys
+import threading
+import time
+
+REPORT_FILE_NAME = "startup_timing.txt"
+
+
+class StartupTimer:
+    """
+    Times one application start: phase marks (imports done, window built, menu
+    shown) and, while track_imports() is on, every module imported for the first
+    time, with its cumulative time and nesting depth as `python -X importtime`
+    reports them. Works in the frozen executable, where -X options cannot be passed.
+
+    Imports are timed where the import system loads a module
+    (importlib._bootstrap._find_and_load), the same place -X importtime measures,
+    so submodules loaded through a from-import's name list or importlib.import_module()
+    are counted as well as import statements.
+    """
+
+    def __init__(self, start=None):
+        self.start = time.perf_counter() if start is None else start
+        self.marks = []         # (phase, seconds since start)
+        self.imports = []       # (depth, module name, cumulative seconds), in the order they finished
+        self._original_find_and_load = None
+        self._thread = None
+        self._depth = 0
+
+    def mark(self, phase):
+        self.marks.append((phase, time.perf_counter() - self.start))
+
+    def track_imports(self):
+        """Time first-time imports made by the calling thread until stop_tracking()."""
+        original = self._original_find_and_load = importlib._bootstrap._find_and_load
+        self._thread = threading.get_ident()
+
+        def timed_find_and_load(name, import_):
+            if name in sys.modules or threading.get_ident() != self._thread:
+                return original(name, import_)
+            depth = self._depth
+            self._depth += 1
+            started = time.perf_counter()
+            try:
+                return original(name, import_)
+            finally:
+                self._depth = depth
+                self.imports.append((depth, name, time.perf_counter() - started))
+
+        # Looked up by name on every import, from C (import statements) and Python alike
+        importlib._bootstrap._find_and_load = timed_find_and_load
+
+    def stop_tracking(self):
+        if self._original_find_and_load is not None:
+            importlib._bootstrap._find_and_load = self._original_find_and_load
+            self._original_find_and_load = None
+
+    def report(self, top=20):
+        """Phase times, then the slowest imports (cumulative, indented by depth)."""
+        lines = ["Startup phases (seconds since launch):"]
+        lines += [f"  {seconds:8.3f}  {phase}" for phase, seconds in self.marks]
+        if self.imports:
+            lines.append(f"Slowest imports (cumulative ms, top {top}):")
+            slowest = sorted(self.imports, key=lambda entry: entry[2], reverse=True)[:top]
+            lines += [f"  {seconds * 1000:8.1f} | {'  ' * depth}{name}" for depth, name, seconds in slowest]
+        return "\n".join(lines)
+
+    def save_report(self, folder):
+        """Write report() to startup_timing.txt in folder (the executable's, when frozen) and return its path."""
+        path = os.path.join(folder, REPORT_FILE_NAME)
+        with open(path, "w", encoding="utf-8") as f:
+            f.write(self.report() + "\n")
+        return path
+
+
+# ------------------ UNIT TESTS ------------------ #
+import unittest
+
+class TestStartupTimer(unittest.TestCase):
+    def test_first_time_imports_are_recorded(self):
+        timer = StartupTimer()
+        original_find_and_load = importlib._bootstrap._find_and_load
+        for name in ("colorsys", "wsgiref", "wsgiref.util"):
+            sys.modules.pop(name, None)
+        timer.track_imports()
+        try:
+            __import__("colorsys")
+            __import__("os")    # Already loaded: not recorded
+            # A submodule loaded only through the from-import name list
+            __import__("wsgiref", fromlist=["util"])
+        finally:
+            timer.stop_tracking()
+        timer.mark("imports")
+        self.assertIs(importlib._bootstrap._find_and_load, original_find_and_load)
+        self.assertEqual([name for _, name, _ in timer.imports], ["colorsys", "wsgiref", "wsgiref.util"])
+        report = timer.report()
+        self.assertIn("imports", report)
+        self.assertIn("| colorsys", report)
@@ -4,13 +4,15 @@ import threading
 import queue
 import sys
 import os
-import time
-import pygame
 import tkinter.font as tkFont
 import shutil
 
-import file_handler  # Your existing file processing module
-from medical_db import search_database  # For the search page
+# file_handler, pygame (audio_player) and the batch machinery are imported where
+# they are first used, so the menu appears without waiting on them
+from medical_db import (  # For the search page
+    search_database, search_page, estimate_count, record_file_base, copy_stored_file, date_range_bounds,
+    CancelToken, SearchCancelled
+)
 from config import *
 
 # Destination folder for verified file pairs
@@ -42,6 +44,7 @@ class QueueOutput:
         pass
 
 def run_processing(log_queue, progress_queue, finish_callback):
+    import file_handler
     original_stdout = sys.stdout
     sys.stdout = QueueOutput(log_queue)
     try:
@@ -49,6 +52,23 @@ def run_processing(log_queue, progress_queue, finish_callback):
     except Exception as e:
         log_queue.put(f"Exception: {e}\n")
     finally:
+        # This thread ends here: do not leave its database connection open
+        file_handler.release_db()
+        sys.stdout.flush()
+        sys.stdout = original_stdout
+    finish_callback()
+
+def run_watch(log_queue, progress_queue, stop_event, finish_callback):
+    import file_handler
+    original_stdout = sys.stdout
+    sys.stdout = QueueOutput(log_queue)
+    try:
+        file_handler.watch(stop_event, progress_callback=lambda processed, total: progress_queue.put((processed, total)))
+    except Exception as e:
+        log_queue.put(f"Exception: {e}\n")
+    finally:
+        # This thread ends here: do not leave its database connection open
+        file_handler.release_db()
         sys.stdout.flush()
         sys.stdout = original_stdout
     finish_callback()
@@ -77,6 +97,11 @@ class UploadFrame(ttk.Frame):
         
         self.process_button = ttk.Button(self.frame, text="Guardar todos los archivos", command=self.start_processing)
         self.process_button.pack(pady=int(5 * APP_SCALE))
+
+        # Watch mode: store each pair as soon as it lands in the receiver folder
+        self.watch_stop = None
+        self.watch_button = ttk.Button(self.frame, text="Guardado automático", command=self.toggle_watch)
+        self.watch_button.pack(pady=int(5 * APP_SCALE))
         
         self.log_queue = queue.Queue()
         self.progress_queue = queue.Queue()
@@ -86,6 +111,7 @@ class UploadFrame(ttk.Frame):
     def start_processing(self):
         self.text.delete(1.0, tk.END)
         self.process_button.config(state="disabled")
+        self.watch_button.config(state="disabled")
         self.progress["value"] = 0
         self.progress["maximum"] = 100  # Will be updated dynamically
         
@@ -93,10 +119,31 @@ class UploadFrame(ttk.Frame):
     
     def processing_finished(self):
         self.after(0, self.finish_ui)
+
+    def toggle_watch(self):
+        if self.watch_stop is not None:
+            self.watch_stop.set()
+            self.watch_button.config(state="disabled")
+            return
+        self.text.delete(1.0, tk.END)
+        self.process_button.config(state="disabled")
+        self.watch_button.config(text="Detener guardado automático")
+        self.progress["value"] = 0
+        self.watch_stop = threading.Event()
+        threading.Thread(target=run_watch, args=(self.log_queue, self.progress_queue, self.watch_stop, self.watch_finished), daemon=True).start()
+
+    def watch_finished(self):
+        self.after(0, self.finish_watch_ui)
+
+    def finish_watch_ui(self):
+        self.watch_stop = None
+        self.watch_button.config(text="Guardado automático", state="normal")
+        self.process_button.config(state="normal")
     
     def finish_ui(self):
         self.progress.stop()
         self.process_button.config(state="normal")
+        self.watch_button.config(state="normal")
         self.text.delete(1.0, tk.END)
         self.text.tag_configure("center", justify='center')
         self.text.tag_configure("green", foreground="green", font=("Helvetica", int(24 * APP_SCALE), "bold"))
@@ -117,22 +164,50 @@ class UploadFrame(ttk.Frame):
             self.label.config(text=f"Processing progress: {processed}/{total} pairs")
         self.after(100, self.update_progress_bar)
 
-def copy_files_to_desktop(audio_path, pdf_path):
+def copy_files_to_desktop(audio_path, pdf_path, base_name=None):
     """
-    Copies the audio_path and pdf_path to the user's desktop.
+    Copies the audio_path and pdf_path to the user's desktop, named base_name
+    (plus their extension) if given, since stored files may be named by content hash.
+    Archived files are extracted from their bundle.
     """
     if not audio_path or not pdf_path:
         messagebox.showwarning("Advertencia", "No se encontró la ruta de audio o PDF en este registro.")
         return
     
     try:
-        shutil.copy2(audio_path, desktop)
-        shutil.copy2(pdf_path, desktop)
+        for path in (audio_path, pdf_path):
+            file_name = base_name + os.path.splitext(path)[1] if base_name else os.path.basename(path)
+            copy_stored_file(db_path, path, os.path.join(desktop, file_name))
         messagebox.showinfo("Éxito", "Los archivos se copiaron al escritorio con éxito.")
     except Exception as e:
         messagebox.showerror("Error", f"No se pudieron copiar los archivos: {e}")
 
 class SearchFrame(ttk.Frame):
+    # Results fetched per page as the list is scrolled
+    SEARCH_PAGE_SIZE = 200
+
+    # Typing searches once the user pauses this long
+    SEARCH_DEBOUNCE_MS = 300
+    # How often finished searches are picked up from the worker threads (about 60 fps)
+    SEARCH_POLL_MS = 16
+    # Shorter report text only searches with the button
+    MIN_TYPED_TEXT = 3
+
+    # Result list columns: (record key, heading, width)
+    RESULT_COLUMNS = (
+        ("record_id", "ID", 60),
+        ("patient_id", "Cédula", 100),
+        ("patient_name", "Nombre Paciente", 220),
+        ("medical_procedure", "Procedimiento", 140),
+        ("procedure_date", "Fecha Proc.", 90),
+        ("transcription_date", "Fecha Transc.", 90),
+        ("doctor", "Médico", 160),
+        ("snippet", "Texto", 300),
+    )
+
+    # Match mode choices shown to the user -> search_database(match=...); the first is the default
+    MATCH_LABELS = {"Contiene": "contains", "Empieza por": "prefix", "Exacta": "exact"}
+
     def __init__(self, parent, controller):
         super().__init__(parent)
         self.controller = controller
@@ -160,112 +235,257 @@ class SearchFrame(ttk.Frame):
         ttk.Label(input_frame, text="Fecha de Transcripción:").grid(row=2, column=0, sticky="e", padx=int(5 * APP_SCALE), pady=int(5 * APP_SCALE))
         self.transcription_date_entry = ttk.Entry(input_frame)
         self.transcription_date_entry.grid(row=2, column=1, sticky="w", padx=int(5 * APP_SCALE), pady=int(5 * APP_SCALE))
+
+        # Full-text search over names, doctor, procedure and the report body
+        ttk.Label(input_frame, text="Texto del Informe:").grid(row=3, column=0, sticky="e", padx=int(5 * APP_SCALE), pady=int(5 * APP_SCALE))
+        self.report_text_entry = ttk.Entry(input_frame)
+        self.report_text_entry.grid(row=3, column=1, sticky="w", padx=int(5 * APP_SCALE), pady=int(5 * APP_SCALE))
+
+        # How cédula, name and date are compared. "Contiene" finds what the old search
+        # found; "Empieza por" and "Exacta" are faster (they use the indexes) when asked for
+        ttk.Label(input_frame, text="Coincidencia:").grid(row=4, column=0, sticky="e", padx=int(5 * APP_SCALE), pady=int(5 * APP_SCALE))
+        self.match_combo = ttk.Combobox(input_frame, values=list(self.MATCH_LABELS), state="readonly")
+        self.match_combo.set("Contiene")
+        self.match_combo.grid(row=4, column=1, sticky="w", padx=int(5 * APP_SCALE), pady=int(5 * APP_SCALE))
+
+        # Transcription date range (DD/MM/YYYY, both inclusive)
+        ttk.Label(input_frame, text="Transcrito Desde:").grid(row=5, column=0, sticky="e", padx=int(5 * APP_SCALE), pady=int(5 * APP_SCALE))
+        self.date_from_entry = ttk.Entry(input_frame)
+        self.date_from_entry.grid(row=5, column=1, sticky="w", padx=int(5 * APP_SCALE), pady=int(5 * APP_SCALE))
+
+        ttk.Label(input_frame, text="Transcrito Hasta:").grid(row=6, column=0, sticky="e", padx=int(5 * APP_SCALE), pady=int(5 * APP_SCALE))
+        self.date_to_entry = ttk.Entry(input_frame)
+        self.date_to_entry.grid(row=6, column=1, sticky="w", padx=int(5 * APP_SCALE), pady=int(5 * APP_SCALE))
         
         search_button = ttk.Button(input_frame, text="Search", command=self.perform_search)
-        search_button.grid(row=3, column=0, columnspan=2, pady=int(10 * APP_SCALE))
-        
-        # Results container (scrollable)
+        search_button.grid(row=7, column=0, columnspan=2, pady=int(10 * APP_SCALE))
+
+        # Result count, "no results" and errors
+        self.status_label = ttk.Label(self, text="")
+        self.status_label.pack(pady=int(2 * APP_SCALE))
+
+        # Details of the selected result and the per-row action
+        detail_frame = ttk.Frame(self)
+        detail_frame.pack(side="bottom", fill="x", padx=int(10 * APP_SCALE), pady=int(5 * APP_SCALE))
+        self.detail_label = ttk.Label(detail_frame, text="", justify="left")
+        self.detail_label.pack(side="left", fill="x", expand=True)
+        self.copy_button = ttk.Button(detail_frame, text="Copiar al Escritorio",
+                                      command=self.copy_selected, state="disabled")
+        self.copy_button.pack(side="right")
+
+        # Results: a Treeview keeps rows as data and only draws the visible ones,
+        # so thousands of hits cost no widgets; pages are fetched while scrolling
         self.results_container = ttk.Frame(self)
         self.results_container.pack(fill="both", expand=True, padx=int(10 * APP_SCALE), pady=int(10 * APP_SCALE))
 
-        # 1) Create a Canvas and a Scrollbar
-        self.results_canvas = tk.Canvas(self.results_container)
-        self.results_canvas.pack(side="left", fill="both", expand=True)
-        
-        self.scrollbar = ttk.Scrollbar(self.results_container, orient="vertical", command=self.results_canvas.yview)
+        self.results_tree = ttk.Treeview(self.results_container, columns=[c[0] for c in self.RESULT_COLUMNS],
+                                         show="headings", selectmode="browse")
+        for column, heading, width in self.RESULT_COLUMNS:
+            self.results_tree.heading(column, text=heading)
+            self.results_tree.column(column, width=int(width * APP_SCALE), stretch=column in ("patient_name", "snippet"))
+        self.results_tree.pack(side="left", fill="both", expand=True)
+        
+        self.scrollbar = ttk.Scrollbar(self.results_container, orient="vertical", command=self.results_tree.yview)
         self.scrollbar.pack(side="right", fill="y")
-        
-        self.results_canvas.configure(yscrollcommand=self.scrollbar.set)
-        
-        # 2) Create an inner frame inside the Canvas
-        self.inner_frame = ttk.Frame(self.results_canvas)
-        # The window on the canvas that will contain `self.inner_frame`
-        self.canvas_window = self.results_canvas.create_window((0, 0), window=self.inner_frame, anchor="nw")
-        
-        # 3) Bind events to make the canvas scroll properly
-        self.inner_frame.bind("<Configure>", self.on_frame_configure)
-        self.results_canvas.bind("<Configure>", self.on_canvas_configure)
-        
-    def on_frame_configure(self, event):
-        """
-        Reset the scroll region to encompass the inner frame.
-        """
-        self.results_canvas.configure(scrollregion=self.results_canvas.bbox("all"))
+        self.results_tree.configure(yscrollcommand=self.on_tree_scroll)
+        self.results_tree.bind("<<TreeviewSelect>>", self.on_select)
+        self.results_tree.bind("<Double-1>", lambda event: self.copy_selected())
 
-    def on_canvas_configure(self, event):
-        """
-        When the canvas is resized, match the inner frame's width to the canvas's width.
-        """
-        canvas_width = event.width
-        self.results_canvas.itemconfig(self.canvas_window, width=canvas_width)
+        self.records = {}           # tree item id -> record dict
+        self.search_filters = None
+        self.next_after_id = None
+        self.loading = False
 
-    def perform_search(self):
-        # Clear old results
-        for child in self.inner_frame.winfo_children():
-            child.destroy()
-        
-        patient_id = self.patient_id_entry.get().strip() or None
-        patient_name = self.patient_name_entry.get().strip() or None
-        transcription_date = self.transcription_date_entry.get().strip() or None
-        
+        # Searches run on worker threads; their outcomes come back through search_queue,
+        # polled with after() while any is running. Only the latest search's results are shown.
+        self.search_queue = queue.Queue()
+        self.search_generation = 0
+        self.search_cancel = None
+        self.jobs_running = 0
+        self.last_criteria = None
+        self.debounce_id = None
+
+        # Search as you type
+        for entry in (self.patient_id_entry, self.patient_name_entry, self.transcription_date_entry,
+                      self.report_text_entry, self.date_from_entry, self.date_to_entry):
+            entry.bind("<KeyRelease>", self.on_input_changed)
+        self.match_combo.bind("<<ComboboxSelected>>", self.on_input_changed)
+
+    def clear_results(self):
+        self.results_tree.delete(*self.results_tree.get_children())
+        self.records = {}
+        self.next_after_id = None
+        self.loading = False
+        self.detail_label.config(text="")
+        self.copy_button.config(state="disabled")
+
+    def read_criteria(self):
+        """Return (report_text, filters) from the search inputs."""
+        filters = dict(
+            patient_id=self.patient_id_entry.get().strip() or None,
+            patient_name=self.patient_name_entry.get().strip() or None,
+            transcription_date=self.transcription_date_entry.get().strip() or None,
+            match=self.MATCH_LABELS[self.match_combo.get()],
+            date_from=self.date_from_entry.get().strip() or None,
+            date_to=self.date_to_entry.get().strip() or None
+        )
+        return self.report_text_entry.get().strip() or None, filters
+
+    def on_input_changed(self, event=None):
+        """Search once typing pauses; the search in flight is stale already."""
+        if self.debounce_id is not None:
+            self.after_cancel(self.debounce_id)
+            self.debounce_id = None
+        unchanged = self.read_criteria() == self.last_criteria
+        if unchanged and not (self.search_cancel is not None and self.search_cancel.cancelled):
+            return      # arrows, Tab and the like
+        if self.search_cancel is not None:
+            self.search_cancel.cancel()
+        self.debounce_id = self.after(self.SEARCH_DEBOUNCE_MS, lambda: self.perform_search(typed=True))
+
+    def perform_search(self, typed=False):
+        if self.debounce_id is not None:
+            self.after_cancel(self.debounce_id)
+            self.debounce_id = None
+        report_text, filters = self.read_criteria()
+        self.last_criteria = (report_text, filters)
         try:
-            result = search_database(
-                db_path=db_path,
-                patient_id=patient_id,
-                patient_name=patient_name,
-                transcription_date=transcription_date
-            )
-        except Exception as e:
-            # If there's an error, just show one label
-            ttk.Label(self.inner_frame, text=f"Error durante la búsqueda: {e}").pack(pady=int(5 * APP_SCALE))
+            date_range_bounds(filters["date_from"], filters["date_to"])
+        except ValueError:
+            # A mistyped bound would otherwise search the whole range
+            if self.search_cancel is not None:
+                self.search_cancel.cancel()
+            self.search_generation += 1
+            self.clear_results()
+            self.status_label.config(text="Fecha no válida: use DD/MM/AAAA o AAAA-MM-DD.")
+            return
+        if typed and report_text and len(report_text) < self.MIN_TYPED_TEXT:
+            self.status_label.config(text=f"Escriba al menos {self.MIN_TYPED_TEXT} letras del informe o pulse Search.")
             return
-        
-        records = result.get("results", [])
-        if not records:
-            ttk.Label(self.inner_frame, text="No se encontró nada.").pack(pady=int(5 * APP_SCALE))
-        else:
-            for idx, record in enumerate(records, start=1):
-                self.create_result_item(record, idx)
 
-    def create_result_item(self, record, index):
-        """
-        Creates a frame that shows the record info and a 'Copy to Desktop' button.
-        """
-        item_frame = ttk.Frame(self.inner_frame, relief="groove", borderwidth=2)
-        item_frame.pack(fill="x", padx=int(5 * APP_SCALE), pady=int(5 * APP_SCALE))
-        
-        # Title or index
-        header_label = ttk.Label(item_frame, text=f"Resultado #{index}", font=("Helvetica", int(10 * APP_SCALE), "bold"))
-        header_label.pack(pady=(int(5 * APP_SCALE), int(2 * APP_SCALE)))
-        
+        if self.search_cancel is not None:
+            self.search_cancel.cancel()
+        self.search_generation += 1
+        self.search_cancel = CancelToken()
+        self.search_filters = filters
+        self.clear_results()
+        self.status_label.config(text="Buscando...")
+        self.start_search_job(self.run_search, self.show_search_results, report_text, filters)
+
+    def start_search_job(self, job, handler, *args):
+        """Run job(cancel, *args) on a worker thread; handler(result) then runs on the Tk thread."""
+        threading.Thread(
+            target=self.search_worker,
+            args=(self.search_generation, self.search_cancel, job, handler) + args,
+            daemon=True
+        ).start()
+        self.jobs_running += 1
+        if self.jobs_running == 1:
+            self.after(self.SEARCH_POLL_MS, self.poll_search_results)
+
+    def search_worker(self, generation, cancel, job, handler, *args):
+        # No Tk calls here: the outcome is handed over through search_queue
+        try:
+            self.search_queue.put((generation, handler, job(cancel, *args), None))
+        except SearchCancelled:
+            self.search_queue.put((generation, None, None, None))
+        except Exception as e:
+            self.search_queue.put((generation, handler, None, e))
+
+    def poll_search_results(self):
+        while True:
+            try:
+                generation, handler, result, error = self.search_queue.get_nowait()
+            except queue.Empty:
+                break
+            self.jobs_running -= 1
+            if generation != self.search_generation:
+                continue    # superseded by a newer search
+            if handler is None:
+                self.loading = False    # cancelled
+                continue
+            if error is not None:
+                self.loading = False
+                self.status_label.config(text=f"Error durante la búsqueda: {error}")
+            else:
+                handler(result)
+        if self.jobs_running:
+            self.after(self.SEARCH_POLL_MS, self.poll_search_results)
+
+    def run_search(self, cancel, report_text, filters):
+        """Worker side of perform_search(): returns (records, status text, next_after_id)."""
+        if report_text:
+            # Full-text results come ranked and already capped at FTS_RESULT_LIMIT
+            records = search_database(db_path=db_path, text=report_text, cancel=cancel, **filters).get("results", [])
+            return records, f"Resultados: {len(records)}", None
+        # Otherwise the first page now, the rest as the list is scrolled
+        total, exact = estimate_count(db_path, cancel=cancel, **filters)
+        page = search_page(db_path, self.SEARCH_PAGE_SIZE, cancel=cancel, **filters)
+        status = f"Resultados: {total}" if exact else f"Resultados: más de {total}"
+        return [row.as_dict() for row in page.rows], status, page.next_after_id
+
+    def show_search_results(self, result):
+        records, status, self.next_after_id = result
+        self.status_label.config(text=status if records else "No se encontró nada.")
+        self.show_records(records)
+
+    def show_records(self, records):
+        """Append result rows to the list."""
+        for record in records:
+            values = [record.get(column, "") for column, _, _ in self.RESULT_COLUMNS]
+            self.records[self.results_tree.insert("", "end", values=values)] = record
+
+    def on_tree_scroll(self, first, last):
+        """Scrollbar callback; fetches the next page once the end of the list comes into view."""
+        self.scrollbar.set(first, last)
+        if float(last) >= 0.9 and self.next_after_id is not None and not self.loading:
+            self.loading = True
+            self.start_search_job(self.fetch_page, self.show_page, self.next_after_id, self.search_filters)
+
+    def fetch_page(self, cancel, after_id, filters):
+        return search_page(db_path, self.SEARCH_PAGE_SIZE, after_id, cancel=cancel, **filters)
+
+    def show_page(self, page):
+        self.loading = False
+        self.next_after_id = page.next_after_id
+        self.show_records([row.as_dict() for row in page.rows])
+
+    def selected_record(self):
+        selection = self.results_tree.selection()
+        return self.records.get(selection[0]) if selection else None
+
+    def on_select(self, event=None):
+        record = self.selected_record()
+        self.copy_button.config(state="normal" if record else "disabled")
         # Show the record data as lines
-        info_text = ""
-        for key, value in record.items():
-            info_text += f"{key}: {value}\n"
-        
-        info_label = ttk.Label(item_frame, text=info_text, justify="left")
-        info_label.pack(padx=int(10 * APP_SCALE), pady=int(2 * APP_SCALE))
-        
-        # "Copy to Desktop" button
-        audio_path = record.get("audio_file_path")
-        pdf_path = record.get("pdf_file_path")
-        
-        copy_button = ttk.Button(
-            item_frame, 
-            text="Copiar al Escritorio", 
-            command=lambda: copy_files_to_desktop(audio_path, pdf_path)
-        )
-        copy_button.pack(pady=int(5 * APP_SCALE))
+        self.detail_label.config(text="\n".join(f"{key}: {value}" for key, value in (record or {}).items()))
+
+    def copy_selected(self):
+        """Copy the selected result's audio and PDF to the desktop."""
+        record = self.selected_record()
+        if record is None:
+            return
+        base_name = record_file_base(record["patient_id"], record["procedure_date"],
+                                     record["doctor"], record["record_id"])
+        copy_files_to_desktop(record.get("audio_file_path"), record.get("pdf_file_path"), base_name)
 
 class VerifyMatchFrame(ttk.Frame):
+    # How often a pair still being parsed in the background is checked on
+    INFO_POLL_MS = 50
+    # Playback needed before the checkboxes unlock, and how often it is checked
+    MIN_LISTEN_SECONDS = 2
+    AUDIO_POLL_MS = 100
+
     def __init__(self, parent, controller):
         super().__init__(parent)
         self.controller = controller
         
-        # Initialize pygame mixer for audio playback
-        pygame.mixer.init()
+        # Audio playback; the mixer stays initialized across pairs
+        from audio_player import AudioPlayer
+        self.player = AudioPlayer()
         self.audio_played = False
-        self.audio_play_start_time = None
+        self.audio_started = False
+        self.audio_heard = 0.0      # Furthest position seen while the clip was playing
         
         # Single-file mode paths
         self.audio_file_path = None
@@ -279,6 +499,14 @@ class VerifyMatchFrame(ttk.Frame):
         
         # Storage for extracted PDF info
         self.pdf_info = {}
+        # Parses the upcoming pairs' PDFs (and warms their audio) off the UI thread
+        from info_extractor import enable_extraction_cache, set_pdf_backend
+        from pair_prefetcher import PairPrefetcher
+        # Set up here, not through file_handler's import (which may not have happened
+        # yet), so prefetched results use the configured backend and are cached
+        enable_extraction_cache(EXTRACTION_CACHE_PATH)
+        set_pdf_backend(PDF_BACKEND)
+        self.prefetcher = PairPrefetcher(lookahead=VERIFY_PREFETCH_LOOKAHEAD)
         
         # Booleans for the new checkboxes
         self.ambulatorio_var = tk.BooleanVar(value=False)
@@ -524,15 +752,28 @@ class VerifyMatchFrame(ttk.Frame):
         
         audio_filename = os.path.basename(audio_path)
         self.audio_label.config(text=audio_filename)
+        # This pair's audio and the next one's are read into memory in the background
+        self.player.preload([pair[0] for pair in self.pending_pairs[index:index + 2]])
         self.play_button.config(state="normal")
         self.reset_button.config(state="normal")
         
         pdf_filename = os.path.basename(pdf_path)
         self.pdf_label.config(text=pdf_filename)
         
+        # Usually parsed already while the previous pair was on screen
+        self.prefetcher.prefetch(self.pending_pairs, index)
+        self.wait_for_pdf_info(self.prefetcher.future(audio_path, pdf_path), pdf_path)
+
+    def wait_for_pdf_info(self, future, pdf_path):
+        """Show the PDF info once the prefetcher's future is done, without blocking the UI."""
+        if pdf_path != self.pdf_file_path:
+            return  # Another pair or file was picked meanwhile
+        if not future.done():
+            self.patient_name_var.set("Nombre del Paciente: Cargando...")
+            self.after(self.INFO_POLL_MS, self.wait_for_pdf_info, future, pdf_path)
+            return
         try:
-            from info_extractor import get_requested_info
-            self.pdf_info = get_requested_info(pdf_path)
+            self.pdf_info = future.result()
         except Exception as e:
             self.pdf_info = {}
             messagebox.showerror("Error", f"Error extracting info from PDF: {e}")
@@ -562,7 +803,8 @@ class VerifyMatchFrame(ttk.Frame):
             self.play_button.config(state="normal")
             self.reset_button.config(state="normal")
             self.audio_played = False
-            self.audio_play_start_time = None
+            self.audio_started = False
+            self.player.preload([file_path])
             self.patient_check_var.set(False)
             self.doctor_check_var.set(False)
             self.patient_check.config(state="disabled")
@@ -578,23 +820,10 @@ class VerifyMatchFrame(ttk.Frame):
             self.pdf_file_path = file_path
             filename = os.path.basename(file_path)
             self.pdf_label.config(text=filename)
-            
-            try:
-                from info_extractor import get_requested_info
-                self.pdf_info = get_requested_info(file_path)
-            except Exception as e:
-                self.pdf_info = {}
-                messagebox.showerror("Error", f"Error extracting info from PDF: {e}")
-            
-            patient_name = self.pdf_info.get("Patient Name", "Not Available")
-            doctor = self.pdf_info.get("Doctor", "Not Available")
-            exam_type = self.pdf_info.get("Exam Type", "Not Available")
-            transcription_date = self.pdf_info.get("Transcription Date", "Not Available")
-            
-            self.patient_name_var.set(f"Nombre del Paciente: {patient_name}")
-            self.doctor_name_var.set(f"Doctor: {doctor}")
-            self.exam_type_var.set(f"Tipo de Examen: {exam_type}")
-            self.transcription_date_var.set(f"Fecha de Transcripción: {transcription_date}")
+            self.pdf_info = {}
+            # Schedule only this file: whatever an earlier pick left behind is dropped
+            self.prefetcher.prefetch([(self.audio_file_path, file_path)], 0)
+            self.wait_for_pdf_info(self.prefetcher.future(self.audio_file_path, file_path), file_path)
             
             self.patient_check_var.set(False)
             self.doctor_check_var.set(False)
@@ -608,16 +837,16 @@ class VerifyMatchFrame(ttk.Frame):
     def play_audio(self):
         if self.audio_file_path:
             try:
-                pygame.mixer.music.load(self.audio_file_path)
-                pygame.mixer.music.play()
-                self.audio_play_start_time = time.time()
-                self.after(2100, self.check_audio_played)  # 2.1 seconds
+                self.player.play(self.audio_file_path)
+                self.audio_started = True
+                self.audio_heard = 0.0
+                self.after(self.AUDIO_POLL_MS, self.check_audio_played)
             except Exception as e:
                 messagebox.showerror("Error", f"Error playing audio: {e}")
     
     def reset_audio(self):
-        pygame.mixer.music.stop()
-        self.audio_play_start_time = None
+        self.player.stop()
+        self.audio_started = False
         self.patient_check_var.set(False)
         self.doctor_check_var.set(False)
         self.patient_check.config(state="disabled")
@@ -625,12 +854,19 @@ class VerifyMatchFrame(ttk.Frame):
         self.verify_button.config(state="disabled")
     
     def check_audio_played(self):
-        if self.audio_play_start_time and (time.time() - self.audio_play_start_time >= 2):
-            self.audio_played = True
-            self.patient_check.config(state="normal")
-            self.doctor_check.config(state="normal")
-        else:
-            self.after(500, self.check_audio_played)
+        if not self.audio_started:
+            return  # Stopped with the reset button, or another file was picked
+        if self.player.is_playing():
+            self.audio_heard = max(self.audio_heard, self.player.position())
+            if self.audio_heard < self.MIN_LISTEN_SECONDS:
+                self.after(self.AUDIO_POLL_MS, self.check_audio_played)
+                return
+        elif self.audio_heard == 0:
+            return  # Playback never started: the clip stays locked until it really plays
+        # MIN_LISTEN_SECONDS of actual playback, or a shorter clip played through to its end
+        self.audio_played = True
+        self.patient_check.config(state="normal")
+        self.doctor_check.config(state="normal")
     
     def check_verification(self):
         if self.patient_check_var.get() and self.doctor_check_var.get():
@@ -640,11 +876,30 @@ class VerifyMatchFrame(ttk.Frame):
     
 
 
-    def verify_match(self):
+    def verify_match(self, future=None, pdf_path=None):
         if not self.audio_file_path or not self.pdf_file_path:
             messagebox.showwarning("Warning", "ATENCION: debe haber seleccionado un audio y un pdf.")
             return
-        
+        if pdf_path is not None and pdf_path != self.pdf_file_path:
+            return  # Another pair or file was picked meanwhile
+
+        # The info on screen was extracted by the prefetcher; if it is not there yet,
+        # wait for the prefetcher rather than parsing the PDF on the UI thread
+        info = self.pdf_info
+        if not info:
+            if future is None:
+                future = self.prefetcher.future(self.audio_file_path, self.pdf_file_path)
+            if not future.done():
+                self.verify_button.config(state="disabled")
+                self.after(self.INFO_POLL_MS, self.verify_match, future, self.pdf_file_path)
+                return
+            try:
+                info = future.result()
+            except Exception as e:
+                messagebox.showerror("Error", f"Error extracting info from PDF: {e}")
+                self.check_verification()
+                return
+
         is_ambulatorio = self.ambulatorio_var.get()
         is_multiples_audios = self.multiples_audios_var.get()
         
@@ -653,11 +908,13 @@ class VerifyMatchFrame(ttk.Frame):
             old_pdf_file_path = self.pdf_file_path
             old_audio_file_path = self.audio_file_path
 
+            import file_handler
             result = file_handler.process_matched_files(
                 self.pdf_file_path, 
                 self.audio_file_path, 
                 is_ambulatorio=is_ambulatorio, 
-                is_multiples_audios=is_multiples_audios
+                is_multiples_audios=is_multiples_audios,
+                info=info
             )
 
             if result:
@@ -695,11 +952,10 @@ class VerifyMatchFrame(ttk.Frame):
         self.audio_file_path = None
         self.pdf_file_path = None
         
-        pygame.mixer.music.stop()
-        pygame.mixer.quit()  # Completely release the mixer to free the file
-        pygame.mixer.init()  # Reinitialize pygame mixer to avoid further issues
+        # Clips play from memory, so unloading is enough to free the audio file
+        self.player.unload()
         self.audio_played = False
-        self.audio_play_start_time = None
+        self.audio_started = False
         self.play_button.config(state="disabled")
         self.reset_button.config(state="disabled")
         
@@ -721,6 +977,8 @@ class VerifyMatchFrame(ttk.Frame):
         self.multiples_audios_var.set(False)
         
         if not keep_batch_mode:
+            self.prefetcher.clear()
+            self.player.preload([])
             self.batch_mode = False
             self.batch_status_label.config(text="")
             self.pending_pairs = []
@@ -850,6 +1108,9 @@ class MainMenu(ttk.Frame):
             self.pending_label_var.set("0")
 
 class MainApp(tk.Tk):
+    # Delay before starting background work (storage migration), after the menu is up
+    BACKGROUND_START_MS = 1500
+
     def __init__(self):
         super().__init__()
         self.title("Almacenamiento de estudios")
@@ -871,19 +1132,37 @@ class MainApp(tk.Tk):
         default_font.configure(size=int(14 * APP_SCALE))
         self.option_add("*Font", default_font)
         
-        container = ttk.Frame(self)
-        container.pack(fill="both", expand=True)
+        self.container = ttk.Frame(self)
+        self.container.pack(fill="both", expand=True)
+        # Only the menu is built at startup; the other pages are built the first time they are shown
         self.frames = {}
         
-        for F in (MainMenu, UploadFrame, SearchFrame, VerifyMatchFrame):
-            frame = F(parent=container, controller=self)
-            self.frames[F] = frame
-            frame.grid(row=0, column=0, sticky="nsew")
-        
         self.show_frame(MainMenu)
 
+        # Files stored under an older db_files layout are moved in the background,
+        # once the menu is on screen
+        self.after(self.BACKGROUND_START_MS, self.start_background_tasks)
+
+    def start_background_tasks(self):
+        # Stored files are only moved when a layout was chosen in config.json
+        if not (STORAGE_LAYOUT_CONFIGURED or ARCHIVE_AFTER_MONTHS):
+            return
+
+        def start():
+            import file_handler
+            file_handler.start_storage_migration(migrate_layout=STORAGE_LAYOUT_CONFIGURED)
+
+        threading.Thread(target=start, daemon=True).start()
+
+    def get_frame(self, cont):
+        if cont not in self.frames:
+            frame = cont(parent=self.container, controller=self)
+            self.frames[cont] = frame
+            frame.grid(row=0, column=0, sticky="nsew")
+        return self.frames[cont]
+
     def show_frame(self, cont):
-        frame = self.frames[cont]
+        frame = self.get_frame(cont)
         if hasattr(frame, "on_show"):
             frame.on_show()
         frame.tkraise()